@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+bench_fetch.py — index size and per-hit fetch cost of the tantivy index.
+
+Reports, for the index under _ai_evolution/.search_index:
+  - on-disk size: total, tantivy doc store (*.store), body store;
+  - searcher.doc() cost per hit (what every printed result pays);
+  - run_query() cost per hit, with and without snippets.
+
+Run it before and after a layout change (on the same corpus) to compare.
+
+Usage:
+    python bench_fetch.py                    # default query set, k=20
+    python bench_fetch.py -k 50 --repeat 20
+    python bench_fetch.py --query "git sync" --query "会话"
+
+Prerequisites:
+    tantivy; an index built with local_search.py --build.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from local_search import find_ai_evolution
+from lsearch.corpus import INDEX_DIR_NAME
+from lsearch.engine import open_index
+from lsearch.query import run_query
+
+DEFAULT_QUERIES = ["session workflow", "git sync", "AI", "rule", "会话"]
+
+
+def index_sizes(index_path):
+    sizes = {"total": 0, "doc_store": 0, "body_store": 0}
+    for entry in os.scandir(index_path):
+        if not entry.is_file() or entry.name.startswith("query_cache"):
+            continue
+        size = entry.stat().st_size
+        sizes["total"] += size
+        if entry.name.endswith(".store"):
+            sizes["doc_store"] += size
+        elif entry.name.startswith("bodies"):
+            sizes["body_store"] += size
+    return sizes
+
+
+def per_hit(fn, hits, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat / max(hits, 1) * 1e6
+
+
+def main():
+    sys.stdout.reconfigure(encoding="utf-8")
+    parser = argparse.ArgumentParser(description="index fetch benchmark")
+    parser.add_argument("-k", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--query", action="append", default=None)
+    args = parser.parse_args()
+
+    index_path = find_ai_evolution() / INDEX_DIR_NAME
+    index = open_index(index_path)
+    searcher = index.searcher()
+    queries = args.query or DEFAULT_QUERIES
+
+    sizes = index_sizes(index_path)
+    print(f"Index size: {sizes['total'] / 1024:.1f} KB "
+          f"(doc store {sizes['doc_store'] / 1024:.1f} KB, "
+          f"body store {sizes['body_store'] / 1024:.1f} KB)")
+
+    fields = ["title", "body"]
+    addresses = [
+        address for q in queries
+        for _, address in searcher.search(index.parse_query(q, fields),
+                                          args.k).hits
+    ]
+    doc_us = per_hit(lambda: [searcher.doc(a) for a in addresses],
+                     len(addresses), args.repeat)
+    print(f"searcher.doc():          {doc_us:7.1f} us/hit "
+          f"({len(addresses)} hits)")
+    for label, options in (("run_query, no snippet:", {}),
+                           ("run_query, snippet 160:", {"snippet_chars": 160})):
+        hits = sum(len(run_query(index, q, args.k, **options)) for q in queries)
+        cost = per_hit(
+            lambda: [run_query(index, q, args.k, **options) for q in queries],
+            hits, args.repeat)
+        print(f"{label:<24} {cost:7.1f} us/hit")
+
+
+if __name__ == "__main__":
+    main()
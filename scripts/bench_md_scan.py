@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+bench_md_scan.py — micro-benchmark: md_scan vs the old regex chain.
+
+Generates a synthetic corpus of large markdown notes (headings, tables,
+links, bold, inline code, fenced code, CJK text) and times one
+scan_markdown() call per document against:
+  - strip_markdown()+extract_title() (the pre-md_scan implementation,
+    kept here verbatim) — title and body only;
+  - the same plus the extra regex passes the old approach needs to also
+    get headings, links and fenced code.
+
+Usage:
+    python bench_md_scan.py                  # 100 docs x 2000 lines
+    python bench_md_scan.py --docs 20 --lines 10000 --repeat 5
+    python bench_md_scan.py --corpus ..      # real notes instead
+
+Prerequisites:
+    Python 3.8+, no external dependencies.
+"""
+
+import argparse
+import pathlib
+import random
+import re
+import sys
+import time
+
+from md_scan import scan_markdown
+
+
+# --- Old implementation (was lsearch/corpus.py) ---
+
+def legacy_strip_markdown(text):
+    text = re.sub(r'```[\s\S]*?```', ' ', text)
+    text = re.sub(r'`[^`]+`', ' ', text)
+    text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)
+    text = re.sub(r'[#*_~>|]', ' ', text)
+    text = re.sub(r'-{3,}', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+
+def legacy_extract_title(content):
+    match = re.search(r'^#\s+(.+)$', content, re.MULTILINE)
+    if match:
+        return match.group(1).strip()
+    for line in content.split('\n'):
+        line = line.strip()
+        if line and not line.startswith('---'):
+            return line[:100]
+    return "(no title)"
+
+
+def legacy_all_parts(content):
+    """What the old approach needs for md_scan's full output set."""
+    return (
+        legacy_extract_title(content),
+        legacy_strip_markdown(content),
+        re.findall(r'^(#{1,6})\s+(.+)$', content, re.MULTILINE),
+        re.findall(r'\[([^\]]+)\]\(([^)]+)\)', content),
+        re.findall(r'```([^\n]*)\n([\s\S]*?)```', content),
+    )
+
+
+# --- Synthetic corpus ---
+
+WORDS = ("session workflow index rule lesson commit search build agent note "
+         "规则 会话 结束 经验 索引 同步").split()
+
+
+def sentence(rng, n=12):
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def make_doc(rng, lines):
+    out = [f"# {sentence(rng, 4)}", ""]
+    while len(out) < lines:
+        kind = rng.random()
+        if kind < 0.05:
+            out += ["", f"## {sentence(rng, 3)}", ""]
+        elif kind < 0.10:
+            out += ["| a | b |", "|---|---|", f"| {sentence(rng, 2)} | x |"]
+        elif kind < 0.13:
+            out += ["```python", "def f(x):", "    return x * 2", "```"]
+        else:
+            out.append(f"{sentence(rng)} **{rng.choice(WORDS)}** "
+                       f"`{rng.choice(WORDS)}` "
+                       f"[{rng.choice(WORDS)}](notes/{rng.choice(WORDS)}.md)")
+    return "\n".join(out)
+
+
+def best_of(fn, docs, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for d in docs:
+            fn(d)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    sys.stdout.reconfigure(encoding="utf-8")
+    parser = argparse.ArgumentParser(description="md_scan micro-benchmark")
+    parser.add_argument("--docs", type=int, default=100)
+    parser.add_argument("--lines", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--corpus", default=None,
+                        help="Benchmark every .md under this dir instead")
+    args = parser.parse_args()
+
+    if args.corpus:
+        docs = [p.read_text(encoding="utf-8")
+                for p in sorted(pathlib.Path(args.corpus).rglob("*.md"))]
+        label = f"{len(docs)} docs from {args.corpus}"
+    else:
+        rng = random.Random(args.seed)
+        docs = [make_doc(rng, args.lines) for _ in range(args.docs)]
+        label = f"{args.docs} docs x {args.lines} lines"
+    total_mb = sum(len(d.encode("utf-8")) for d in docs) / 1e6
+
+    # Same output first — a fast wrong answer is no use
+    mismatches = sum(
+        1 for d in docs
+        if scan_markdown(d).body != legacy_strip_markdown(d)
+        or scan_markdown(d).title != legacy_extract_title(d)
+    )
+
+    legacy = best_of(
+        lambda d: (legacy_extract_title(d), legacy_strip_markdown(d)),
+        docs, args.repeat)
+    legacy_full = best_of(legacy_all_parts, docs, args.repeat)
+    scanned = best_of(scan_markdown, docs, args.repeat)
+
+    print(f"Corpus:  {label} ({total_mb:.1f} MB)")
+    print(f"Legacy title+body:  {legacy:.3f}s  ({total_mb / legacy:.1f} MB/s)")
+    print(f"Legacy all parts:   {legacy_full:.3f}s  "
+          f"({total_mb / legacy_full:.1f} MB/s)")
+    print(f"md_scan all parts:  {scanned:.3f}s  ({total_mb / scanned:.1f} MB/s)")
+    print(f"Speedup vs title+body: {legacy / scanned:.2f}x, "
+          f"vs all parts: {legacy_full / scanned:.2f}x")
+    print(f"Body/title mismatches: {mismatches}/{len(docs)}")
+
+
+if __name__ == "__main__":
+    main()
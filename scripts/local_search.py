@@ -1,15 +1,49 @@
 #!/usr/bin/env python3
-"""local_search.py — BM25 local search for _ai_evolution/ markdown files.
+"""local_search.py — BM25 local search for _ai_evolution/ markdown files
+(plus scripts/**/*.py symbols and configs/*.yaml keys).
 
 Uses tantivy-py (Rust-based search engine) for fast, persistent full-text search.
 Designed to work with AI intent clarification: user gives fuzzy query,
 AI translates to keywords, this script finds exact matches.
 
 Usage:
-    python local_search.py --build              # Build/rebuild index
+    python local_search.py --build              # Update index (changed files only)
+    python local_search.py --build --full       # Drop and rebuild from scratch
+    python local_search.py --build --fold-near  # Index near-duplicates once
+    python local_search.py --watch              # Keep the index current live
+    python local_search.py --related workflows/git_sync.md  # Similar notes
     python local_search.py "query keywords"     # Search (auto-builds if no index)
     python local_search.py "session end" -k 10  # Return top 10 results
+    python local_search.py "git sync" --sections  # Hits as file.md#section + lines
+    python local_search.py "bm25" --snippet 200 # Highlighted snippet per hit
+    python local_search.py "build_index" --sections  # Code: file#symbol + lines
+    python local_search.py "sesion" --boost title=5  # Typos fall back to fuzzy
+    python local_search.py --suggest "session en"  # Complete from indexed words
+    python local_search.py --outline workflows/git_sync.md  # Headings, links...
+    python local_search.py "git" -k 3 --with-outline  # Hits + stored outlines
+    python local_search.py "rule" --dir workflows --since 7d  # Filtered
     python local_search.py --stats              # Show index stats
+    python local_search.py --compact            # Merge segments, drop dead files
+    python local_search.py --export-snapshot    # Index -> one archive to sync
+    python local_search.py --build --history    # Index git history of the notes
+    python local_search.py "rule" --as-of 2026-02-01  # What notes said then
+    python local_search.py "bm25" --first-seen  # When it first appeared
+    python local_search.py --import-snapshot    # Fresh clone: restore + catch up
+    python local_search.py --serve              # Warm server; queries use it
+    python local_search.py --stop               # Stop the warm server
+    python local_search.py "bm25" --backend numpy  # NumPy fallback engine
+    python local_search.py --batch < queries.txt  # Many queries, JSONL out
+    python local_search.py "rule" --root ~/a --root ~/b  # Across projects
+
+Repeated queries are answered from an on-disk result cache that any
+commit invalidates (lsearch/cache.py). Otherwise queries first try a
+running --serve process over a Unix socket (no tantivy import, no index
+open); with no server they run in-process as before.
+Helper modules live in scripts/lsearch/ (engine, server, client, ...);
+other scripts can search in-process through lsearch.api.Index.
+Without tantivy, --backend auto (the default) falls back to a NumPy BM25
+index in .search_index_np/ (lsearch/npbm25.py): bag-of-words queries,
+no stemming, same result format.
 
 Build Justification (per /search_before_build):
 - Need: BM25 search over local markdown files with persistent index
@@ -21,38 +55,26 @@ Build Justification (per /search_before_build):
 """
 
 import argparse
-import os
-import re
 import sys
 import pathlib
-import shutil
-from datetime import datetime
 
-try:
-    import tantivy
-except ImportError:
-    print("ERROR: tantivy not installed. Run: pip install tantivy")
-    sys.exit(1)
-
-
-# --- Configuration ---
-
-# Directories to index (relative to ai_evolution root)
-INDEX_DIRS = [
-    ".",              # Root md files (project_context, skills, etc.)
-    "session_notes",  # Session notes and sub-dirs
-    "readings",       # Research output
-    "workflows",      # Workflow definitions
-]
-
-# File extensions to index
-INDEX_EXTENSIONS = {".md"}
-
-# Files/dirs to skip
-SKIP_PATTERNS = {".git", "__pycache__", ".bm25_index", "node_modules"}
-
-# Index location
-INDEX_DIR_NAME = ".search_index"
+# tantivy/numpy are imported lazily (lsearch.backends) so a query answered
+# by the warm server never pays for them.
+from lsearch.api import Index, SearchResult
+from lsearch.backends import BACKENDS, index_dir_name, load as load_backend
+from lsearch.backends import resolve as resolve_backend
+from lsearch.cache import QueryCache, cache_key, cacheable, commit_token
+from lsearch.client import ask, send_request
+from lsearch.commands import (
+    compact, export_snapshot, import_snapshot, show_history, show_related,
+    show_outline, show_stats, show_suggestions, update_related,
+)
+from lsearch.corpus import (  # noqa: F401  (re-exported for callers)
+    INDEX_DIRS, INDEX_EXTENSIONS, SKIP_PATTERNS, INDEX_DIR_NAME,
+    collect_files, extract_title, strip_markdown,
+)
+from lsearch.filters import parse_boost
+from lsearch.outline import format_outline
 
 
 def find_ai_evolution():
@@ -73,213 +95,124 @@ def find_ai_evolution():
     sys.exit(1)
 
 
-def strip_markdown(text):
-    """Remove markdown formatting for cleaner indexing."""
-    # Remove code blocks
-    text = re.sub(r'```[\s\S]*?```', ' ', text)
-    # Remove inline code
-    text = re.sub(r'`[^`]+`', ' ', text)
-    # Remove markdown links but keep text
-    text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)
-    # Remove headers markers, bold, italic markers
-    text = re.sub(r'[#*_~>|]', ' ', text)
-    # Remove table separators
-    text = re.sub(r'-{3,}', ' ', text)
-    # Collapse whitespace
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
-
-
-def extract_title(content):
-    """Extract first heading as document title."""
-    match = re.search(r'^#\s+(.+)$', content, re.MULTILINE)
-    if match:
-        return match.group(1).strip()
-    # Fallback: first non-empty line
-    for line in content.split('\n'):
-        line = line.strip()
-        if line and not line.startswith('---'):
-            return line[:100]
-    return "(no title)"
-
-
-def collect_files(ai_dir):
-    """Collect all markdown files to index."""
-    files = []
-    for subdir in INDEX_DIRS:
-        target = ai_dir / subdir
-        if not target.exists():
-            continue
-        for root, dirs, filenames in os.walk(target):
-            # Skip unwanted directories
-            dirs[:] = [d for d in dirs if d not in SKIP_PATTERNS]
-            for fname in filenames:
-                fpath = pathlib.Path(root) / fname
-                if fpath.suffix.lower() in INDEX_EXTENSIONS:
-                    files.append(fpath)
-    # Deduplicate (root "." may overlap with subdirs)
-    seen = set()
-    unique = []
-    for f in files:
-        resolved = f.resolve()
-        if resolved not in seen:
-            seen.add(resolved)
-            unique.append(f)
-    return unique
-
-
-def build_schema():
-    """Build the tantivy schema for markdown documents."""
-    builder = tantivy.SchemaBuilder()
-    builder.add_text_field("title", stored=True, tokenizer_name="en_stem")
-    builder.add_text_field("body", stored=True, tokenizer_name="en_stem")
-    builder.add_text_field("path", stored=True, tokenizer_name="raw")
-    builder.add_integer_field("size", stored=True)
-    builder.add_date_field("modified", stored=True)
-    return builder.build()
-
-
-def build_index(ai_dir, force=False):
-    """Build or rebuild the search index."""
-    sys.stdout.reconfigure(encoding="utf-8")
-    index_path = ai_dir / INDEX_DIR_NAME
-    if force and index_path.exists():
-        shutil.rmtree(index_path)
-
-    index_path.mkdir(exist_ok=True)
-    schema = build_schema()
-    index = tantivy.Index(schema, path=str(index_path))
-
-    files = collect_files(ai_dir)
-    writer = index.writer()
+def search_in_process(ai_dir, query_str, top_k=5, backend="auto", **options):
+    """Open the index in this process and run one query (result dicts)."""
+    index = Index(ai_dir, backend, verbose=True)
+    return [r.to_dict() for r in index.search(query_str, top_k, **options)]
 
-    # Clear existing documents for full rebuild
-    # (tantivy doesn't have a simple "delete all", so we rebuild fresh)
-    indexed = 0
-    errors = 0
 
-    for fpath in files:
-        try:
-            content = fpath.read_text(encoding="utf-8")
-            title = extract_title(content)
-            body = strip_markdown(content)
-            rel_path = str(fpath.relative_to(ai_dir))
-            stat = fpath.stat()
-            mtime = datetime.fromtimestamp(stat.st_mtime)
-            # tantivy expects RFC3339 datetime
-            mtime_rfc = mtime.strftime("%Y-%m-%dT%H:%M:%S+00:00")
-
-            writer.add_document(tantivy.Document(
-                title=[title],
-                body=[body],
-                path=[rel_path],
-                size=stat.st_size,
-                modified=mtime_rfc,
-            ))
-            indexed += 1
-        except Exception as e:
-            errors += 1
-            print(f"  WARN: {fpath.name}: {e}")
-
-    writer.commit()
-    writer.wait_merging_threads()
-
-    print(f"Index built: {indexed} files indexed, {errors} errors")
-    print(f"Location: {index_path}")
-    return index
-
-
-def search_index(ai_dir, query_str, top_k=5):
-    """Search the index and return results."""
-    sys.stdout.reconfigure(encoding="utf-8")
-    index_path = ai_dir / INDEX_DIR_NAME
+def format_location(r):
+    """path, or path#anchor (Lstart-end) for section hits."""
+    return SearchResult.from_dict(r).location
 
-    if not index_path.exists():
-        print("No index found. Building...")
-        build_index(ai_dir)
 
-    schema = build_schema()
-    index = tantivy.Index(schema, path=str(index_path))
-    index.reload()
-    searcher = index.searcher()
+def format_snippet(r, mark="**"):
+    """Snippet text with highlighted terms wrapped in `mark`."""
+    text = r["snippet"]
+    for start, end in reversed(r["highlights"]):
+        text = text[:start] + mark + text[start:end] + mark + text[end:]
+    return text
 
-    # Search in both title (boosted) and body
-    query = index.parse_query(query_str, ["title", "body"])
-    search_result = searcher.search(query, top_k)
 
-    if not search_result.hits:
-        print(f"No results for: {query_str}")
-        return []
+def fetch_results(ai_dir, query_str, top_k=5, use_server=True,
+                  backend="auto", **options):
+    """Results from the warm server if it answers, else in-process (also
+    when it refuses, e.g. it runs another backend).
 
-    results = []
-    for score, doc_address in search_result.hits:
-        doc = searcher.doc(doc_address)
-        try:
-            title = doc["title"][0]
-        except (KeyError, IndexError):
-            title = "(no title)"
-        try:
-            path = doc["path"][0]
-        except (KeyError, IndexError):
-            path = "?"
-        try:
-            size = doc["size"][0]
-        except (KeyError, IndexError):
-            size = 0
-
-        results.append({
-            "score": score,
-            "title": title,
-            "path": path,
-            "size": size,
+    Returns None (after printing the error) for a bad option.
+    """
+    response = None
+    if use_server:
+        response = ask(ai_dir, {
+            "op": "search", "query": query_str, "top_k": top_k,
+            "backend": backend, "options": options,
         })
+    if response is not None:
+        return response["results"]
+    try:
+        return search_in_process(ai_dir, query_str, top_k, backend, **options)
+    except ValueError as e:  # bad filter value, unsupported option
+        print(f"ERROR: {e}")
+        return None
+
+
+def cached_results(ai_dir, query_str, top_k=5, use_server=True,
+                   backend="auto", use_cache=True, **options):
+    """Results for one root, or None (after printing the error).
+
+    Answers from the query cache when the index hasn't committed since
+    the same query was last run (never for windows relative to now,
+    see cache.cacheable), otherwise via fetch_results. options
+    are passed through to the backend's run_query (sections, collapse,
+    snippet_chars).
+    """
+    index_path = ai_dir / index_dir_name(backend)
+    tag = commit_token(index_path) if use_cache and cacheable(options) else None
+    cache = QueryCache(index_path) if tag else None
+    key = cache_key(query_str, top_k, resolve_backend(backend), options)
+    results = cache.get(key, tag) if cache else None
+    if results is None:
+        results = fetch_results(ai_dir, query_str, top_k, use_server,
+                                backend, **options)
+        if results is not None and cache:
+            cache.put(key, tag, results)
+    return results
 
-    # Print results
-    print(f"Results for: {query_str}\n")
+
+def print_results(query_str, results):
+    """Print result dicts, one or two lines (plus snippet) per hit."""
+    if not results:
+        print(f"No results for: {query_str}")
+        return
+    stage = results[0].get("stage", "exact")
+    print(f"Results for: {query_str}"
+          + (f"  ({stage} match)" if stage != "exact" else "") + "\n")
     for i, r in enumerate(results):
-        print(f"  {i+1}. [{r['score']:.2f}] {r['path']}")
-        print(f"     {r['title']}")
+        root = f"{r['root']}: " if "root" in r else ""
+        print(f"  {i+1}. [{r['score']:.2f}] {root}{format_location(r)}")
+        print(f"     {r.get('heading') or r['title']}"
+              + (f"  (also: {', '.join(r['aliases'])})" if r.get("aliases") else ""))
+        if r.get("snippet"):
+            print(f"     > {format_snippet(r)}")
+        if r.get("outline"):
+            print("\n".join(format_outline(r["outline"])))
     print()
 
-    return results
-
-
-def show_stats(ai_dir):
-    """Show index statistics."""
-    sys.stdout.reconfigure(encoding="utf-8")
-    index_path = ai_dir / INDEX_DIR_NAME
 
-    if not index_path.exists():
-        print("No index found. Run --build first.")
-        return
+def search_index(ai_dir, query_str, top_k=5, **kwargs):
+    """Search the index and print results (see cached_results)."""
+    results = cached_results(ai_dir, query_str, top_k, **kwargs) or []
+    print_results(query_str, results)
+    return results
 
-    schema = build_schema()
-    index = tantivy.Index(schema, path=str(index_path))
-    index.reload()
-    searcher = index.searcher()
 
-    # Count documents by searching for everything
-    query = index.parse_query("*", ["body"])
-    all_results = searcher.search(query, 1000)
-    doc_count = len(all_results.hits)
+def federated_search(roots, query_str, top_k=5, backend="auto", **kwargs):
+    """Search several roots concurrently and print the merged top-k."""
+    from lsearch.federated import resolve_roots, search_roots
 
-    # Collect files to compare
-    files = collect_files(ai_dir)
+    try:
+        roots = resolve_roots(roots)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return []
+    results = search_roots(roots, lambda root: cached_results(
+        root, query_str, top_k, backend=backend, **kwargs), top_k)
+    print_results(query_str, results)
+    return results
 
-    # Index directory size
-    index_size = sum(
-        f.stat().st_size for f in index_path.rglob("*") if f.is_file()
-    )
 
-    print(f"Index Stats:")
-    print(f"  Documents indexed: {doc_count}")
-    print(f"  Files on disk:     {len(files)}")
-    print(f"  Index size:        {index_size / 1024:.1f} KB")
-    print(f"  Index path:        {index_path}")
+def query_options(args):
+    """run_query keyword arguments from the parsed command line.
 
-    if doc_count != len(files):
-        print(f"\n  ⚠️  Mismatch: {len(files) - doc_count} files not indexed. "
-              f"Run --build to update.")
+    Filters are only passed when set, so plain queries keep the same
+    cache key and work with backends that lack a filter.
+    """
+    options = {"sections": args.sections, "collapse": args.collapse,
+               "snippet_chars": args.snippet}
+    for name in ("dirs", "since", "until", "recent", "boosts", "outline"):
+        if getattr(args, name):
+            options[name] = getattr(args, name)
+    return options
 
 
 def main():
@@ -289,27 +222,174 @@ def main():
         epilog="""Examples:
   python local_search.py "session workflow"     # Search for session workflow
   python local_search.py "BM25 search" -k 10   # Top 10 results
-  python local_search.py --build                # Build/rebuild index
+  python local_search.py --build                # Update index incrementally
+  python local_search.py --build --full         # Full rebuild from scratch
+  python local_search.py "rule" --sections --collapse  # Best section per file
   python local_search.py --stats                # Show index stats
+  python local_search.py --compact              # Merge segments after many updates
+  python local_search.py --serve                # Keep index warm for fast queries
 """
     )
     parser.add_argument("query", nargs="?", help="Search query")
     parser.add_argument("-k", "--top-k", type=int, default=5,
                         help="Number of results (default: 5)")
+    parser.add_argument("--sections", action="store_true",
+                        help="Search heading sections; hits point at file.md#anchor")
+    parser.add_argument("--collapse", action="store_true",
+                        help="With --sections: best section per file only")
+    parser.add_argument("--snippet", type=int, nargs="?", const=160, default=0,
+                        metavar="CHARS",
+                        help="Show a highlighted body snippet per hit "
+                             "(budget in chars, default 160)")
+    parser.add_argument("--with-outline", action="store_true", dest="outline",
+                        help="Show each hit's stored outline (headings, "
+                             "summary, rules, links)")
+    parser.add_argument("--dir", action="append", dest="dirs",
+                        metavar="DIR",
+                        help="Only hits under this directory (repeatable)")
+    parser.add_argument("--since", metavar="WHEN",
+                        help="Only notes modified since YYYY-MM-DD or Nd/Nw")
+    parser.add_argument("--until", metavar="WHEN",
+                        help="Only notes modified up to YYYY-MM-DD or Nd/Nw")
+    parser.add_argument("--recent", type=float, nargs="?", const=2.0,
+                        default=0.0, metavar="WEIGHT",
+                        help="Boost notes modified in the last 7/30/90 days "
+                             "(default weight 2.0)")
+    parser.add_argument("--boost", action="append", type=parse_boost,
+                        metavar="FIELD=WEIGHT",
+                        help="Field boost (title, description, body; "
+                             "default title=3 description=1.5 body=1)")
     parser.add_argument("--build", action="store_true",
-                        help="Build/rebuild search index")
+                        help="Update search index (new/changed/removed files)")
+    parser.add_argument("--full", action="store_true",
+                        help="With --build: drop the index and rebuild from scratch")
+    parser.add_argument("--fold-near", type=float, nargs="?", const=0.9,
+                        metavar="SIM", help="With --build: also index "
+                        "near-duplicate notes once (default SIM 0.9; 0 = off)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="With --build: preprocessing processes "
+                             "(default: CPUs - 1)")
+    parser.add_argument("--heap-mb", type=int, default=128,
+                        help="With --build: tantivy writer heap in MB (default: 128)")
+    parser.add_argument("--writer-threads", type=int, default=0,
+                        help="With --build: tantivy indexing threads (default: auto)")
+    parser.add_argument("--history", action="store_true",
+                        help="Use the git history index (with --build: "
+                             "update it from new commits)")
+    parser.add_argument("--as-of", metavar="WHEN",
+                        help="History search: versions current at WHEN")
+    parser.add_argument("--first-seen", action="store_true",
+                        help="History search: order by first appearance")
+    parser.add_argument("--suggest", metavar="PREFIX",
+                        help="Complete the last word of PREFIX from words "
+                             "in the index (top -k, most common first)")
+    parser.add_argument("--outline", metavar="NOTE", dest="outline_of",
+                        help="Print the outline stored in the index for NOTE "
+                             "(no need to read the file)")
+    parser.add_argument("--related", metavar="NOTE",
+                        help="Notes most similar to NOTE (path relative to "
+                             "_ai_evolution/ or on disk), from the table "
+                             "--build maintains")
+    parser.add_argument("--watch", action="store_true",
+                        help="Update the index as files change "
+                             "(inotify, or mtime polling)")
     parser.add_argument("--stats", action="store_true",
                         help="Show index statistics")
+    parser.add_argument("--compact", action="store_true",
+                        help="Merge index segments and remove unused files")
+    parser.add_argument("--export-snapshot", nargs="?", const="",
+                        metavar="PATH",
+                        help="Write the index to a checksummed archive "
+                             "(default: search_index.snapshot.tar.gz)")
+    parser.add_argument("--import-snapshot", nargs="?", const="",
+                        metavar="PATH",
+                        help="Replace the index with a snapshot, then "
+                             "index only files changed since")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run a warm search server on a local Unix socket")
+    parser.add_argument("--stop", action="store_true",
+                        help="Stop a running --serve process")
+    parser.add_argument("--no-server", action="store_true",
+                        help="Always search in-process, even if a server is up")
+    parser.add_argument("--root", action="append", dest="roots",
+                        metavar="DIR",
+                        help="Search this _ai_evolution root (or its project "
+                             "dir / index dir); repeat to federate")
+    parser.add_argument("--batch", action="store_true",
+                        help="Read queries from stdin (text or JSONL with "
+                             "per-query k/sections/collapse/snippet), "
+                             "write JSONL results with timings")
+    parser.add_argument("--merge", action="store_true",
+                        help="With --batch: add a deduplicated top-k "
+                             "across all queries")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Bypass the on-disk query result cache")
+    parser.add_argument("--backend", choices=BACKENDS, default="auto",
+                        help="Search engine: tantivy, numpy (fallback BM25), "
+                             "or auto = tantivy if installed (default)")
 
     args = parser.parse_args()
+    sys.stdout.reconfigure(encoding="utf-8")
+    args.boosts = dict(args.boost) if args.boost else None
     ai_dir = find_ai_evolution()
 
-    if args.build:
-        build_index(ai_dir, force=True)
+    if args.build and args.history:
+        from lsearch.history import build_history
+        try:
+            build_history(ai_dir, force=args.full)
+        except ValueError as e:  # not a git checkout, git missing
+            print(f"ERROR: {e}")
+    elif args.build:
+        prepared = {}  # reused by the related table
+        Index(ai_dir, args.backend, verbose=True).update(
+            force=args.full, fold_near=args.fold_near, workers=args.workers,
+            heap_size=args.heap_mb * 1_000_000, num_threads=args.writer_threads,
+            collect=prepared)
+        update_related(ai_dir, force=args.full, workers=args.workers,
+                       prepared=prepared)
+    elif args.suggest is not None:
+        show_suggestions(ai_dir, args.suggest, args.top_k, args.backend,
+                         use_server=not args.no_server)
+    elif args.outline_of:
+        show_outline(ai_dir, args.outline_of, args.backend,
+                     use_server=not args.no_server)
+    elif args.related:
+        show_related(ai_dir, args.related, args.top_k)
+    elif args.watch:
+        from lsearch.watch import watch
+        watch(ai_dir, load_backend(args.backend),
+              workers=args.workers, heap_size=args.heap_mb * 1_000_000,
+              num_threads=args.writer_threads)
     elif args.stats:
-        show_stats(ai_dir)
+        show_stats(ai_dir, args.backend)
+    elif args.compact:
+        compact(ai_dir, args.backend)
+    elif args.export_snapshot is not None:
+        export_snapshot(ai_dir, args.backend, args.export_snapshot)
+    elif args.import_snapshot is not None:
+        import_snapshot(ai_dir, args.backend, args.import_snapshot,
+                        workers=args.workers)
+    elif args.serve:
+        from lsearch.server import serve
+        serve(ai_dir, args.backend)
+    elif args.stop:
+        stopped = send_request(ai_dir, {"op": "shutdown"}) is not None
+        print("Server stopped" if stopped else "No server running")
+    elif args.batch:
+        from lsearch.batch import batch_search
+        batch_search(ai_dir, sys.stdin, args.top_k, backend=args.backend,
+                     merge=args.merge, **query_options(args))
+    elif args.query and (args.history or args.as_of or args.first_seen):
+        show_history(ai_dir, args.query, args.top_k, args.as_of,
+                     args.first_seen)
+    elif args.query and args.roots:
+        federated_search(args.roots, args.query, args.top_k,
+                         use_server=not args.no_server, backend=args.backend,
+                         use_cache=not args.no_cache, **query_options(args))
     elif args.query:
-        search_index(ai_dir, args.query, args.top_k)
+        search_index(ai_dir, args.query, args.top_k,
+                     use_server=not args.no_server, backend=args.backend,
+                     use_cache=not args.no_cache, **query_options(args))
     else:
         parser.print_help()
 
@@ -0,0 +1,6 @@
+"""lsearch — helper modules for local_search.py.
+
+local_search.py stays the CLI entry point; the pieces that would push it
+past the 400-line rule live here. Scripts that want results as values
+use lsearch.api (Index, SearchResult).
+"""
@@ -0,0 +1,177 @@
+"""api.py — in-process search API: an Index handle and typed results.
+
+For scripts that want hits as values rather than printed text
+(session_bootstrap.py, workflow helpers) without spawning
+local_search.py and parsing its output:
+
+    from lsearch.api import Index
+
+    index = Index(ai_dir)                    # backend "auto", "tantivy", "numpy"
+    for hit in index.search("session end", top_k=3, sections=True):
+        print(hit.location, hit.title)
+    index.search_many(["bm25", "git sync"])  # [[SearchResult, ...], ...]
+    index.suggest("sess")                    # [("session", 41), ...]
+    index.outline("workflows/git_sync.md")   # headings, summary, links, ...
+    index.update()                           # incremental build -> counts
+
+One Index stays open for the caller's whole run. Like the --serve
+process (server.WarmIndex) it checks the index generation before each
+query and only reloads after a build committed, so update() — or a build
+in another process — is picked up without reopening. Nothing is printed
+unless verbose=True (builds and restores report through their log
+argument, which is print or a no-op here); bad options raise ValueError.
+local_search.py is the CLI over this, plus the query cache and the warm
+server.
+"""
+
+import dataclasses
+import pathlib
+
+from lsearch.backends import load as load_backend
+from lsearch.server import WarmIndex
+
+
+def _quiet(*_args, **_kwargs):
+    """log for builds when verbose=False."""
+
+
+@dataclasses.dataclass(frozen=True)
+class SearchResult:
+    """One hit, as returned by Index.search.
+
+    anchor, heading and lines (start, end) are set on section hits;
+    snippet and highlights ((start, end) char offsets in the snippet)
+    when snippet_chars > 0; outline (outline.py dict) with outline=True;
+    root and raw_score in federated results; aliases, the paths of
+    folded copies of the file (dedup.py).
+    """
+
+    score: float
+    title: str
+    path: str
+    size: int = 0
+    stage: str = "exact"
+    description: str = ""
+    anchor: str = ""
+    heading: str = ""
+    lines: tuple = None
+    snippet: str = None
+    highlights: tuple = ()
+    outline: dict = None
+    root: str = None
+    raw_score: float = None
+    aliases: tuple = ()
+
+    @classmethod
+    def from_dict(cls, result):
+        """From a backend result dict; unknown keys are ignored."""
+        names = {f.name for f in dataclasses.fields(cls)}
+        values = {k: v for k, v in result.items() if k in names}
+        if "lines" in values:
+            values["lines"] = tuple(values["lines"])
+        if "highlights" in values:
+            values["highlights"] = tuple(map(tuple, values["highlights"]))
+        if "aliases" in values:
+            values["aliases"] = tuple(values["aliases"])
+        return cls(**values)
+
+    def to_dict(self):
+        """The backend dict shape (JSON-ready; optional keys only if set)."""
+        result = {"score": self.score, "title": self.title,
+                  "path": self.path, "size": self.size, "stage": self.stage}
+        if self.description:
+            result["description"] = self.description
+        if self.lines is not None:
+            result.update(anchor=self.anchor, heading=self.heading,
+                          lines=list(self.lines))
+        if self.snippet is not None:
+            result.update(snippet=self.snippet,
+                          highlights=[list(h) for h in self.highlights])
+        if self.outline is not None:
+            result["outline"] = self.outline
+        if self.root is not None:
+            result.update(root=self.root, raw_score=self.raw_score)
+        if self.aliases:
+            result["aliases"] = list(self.aliases)
+        return result
+
+    @property
+    def location(self):
+        """path, or path#anchor (Lstart-end) for section hits."""
+        if self.lines is None:
+            return self.path
+        anchor = f"#{self.anchor}" if self.anchor else ""
+        return f"{self.path}{anchor}  (L{self.lines[0]}-{self.lines[1]})"
+
+
+class Index:
+    """The search index of one _ai_evolution root, kept open between calls.
+
+    Opened on first search; a missing index is restored from the default
+    snapshot if there is one, else built. Safe to share between threads.
+    """
+
+    def __init__(self, ai_dir, backend="auto", verbose=False):
+        self.ai_dir = pathlib.Path(ai_dir)
+        self.backend = load_backend(backend)
+        self.path = self.ai_dir / self.backend.index_dir_name
+        self.verbose = verbose
+        self._log = print if verbose else _quiet
+        self._warm = WarmIndex(self.backend, self.path)
+
+    def _open(self):
+        if not self.path.exists():
+            from lsearch.commands import import_snapshot
+            from lsearch.snapshot import snapshot_name
+
+            snapshot = self.ai_dir / snapshot_name(self.backend.index_dir_name)
+            if not snapshot.exists() or not import_snapshot(
+                    self.ai_dir, self.backend.name, log=self._log):
+                self._log("No index found. Building...")
+                self.backend.build_index(self.ai_dir, log=self._log)
+        return self._warm.get()
+
+    def search(self, query, top_k=5, **options):
+        """[SearchResult, ...] best first.
+
+        options are the backend's run_query keywords: sections, collapse,
+        snippet_chars, dirs, since, until, recent, boosts, outline.
+        """
+        return [SearchResult.from_dict(r) for r in self.backend.run_query(
+            self._open(), query, top_k, **options)]
+
+    def search_many(self, queries, top_k=5, **options):
+        """One result list per query, all run on the same searcher."""
+        index = self._open()
+        return [
+            [SearchResult.from_dict(r) for r in self.backend.run_query(
+                index, query, top_k, **options)]
+            for query in queries
+        ]
+
+    def suggest(self, text, limit=10):
+        """[(text with its last word completed, notes), ...] (suggest.py)."""
+        from lsearch.suggest import suggest
+
+        return suggest(self.backend, self._open(), text, limit)
+
+    def outline(self, rel_path):
+        """Stored outline dict of one file (root-relative path), or None."""
+        return self.backend.file_outline(self._open(), rel_path)
+
+    def update(self, force=False, paths=None, **writer_options):
+        """Index new, changed and removed files; returns the build counts.
+
+        force=True rebuilds from scratch; paths limits the update to those
+        root-relative files; writer_options are workers, heap_size,
+        num_threads, fold_near (dedup.py) and collect (iter_prepared).
+        The next search sees the result.
+        """
+        return self.backend.build_index(self.ai_dir, force=force, paths=paths,
+                                        log=self._log, **writer_options)
+
+    def stats(self):
+        """The backend's index statistics dict, or None if not built."""
+        if not self.path.exists():
+            return None
+        return self.backend.index_stats(self.path)
@@ -0,0 +1,74 @@
+"""backends.py — choose between the tantivy engine and the NumPy fallback.
+
+Both backends index the same documents and return the same result
+dicts; callers get a namespace with a common set of functions:
+
+    build_index(ai_dir, force, workers, log=print, collect=None,
+                **writer_options) -> counts
+    open_index(index_path), index_generation(index_path)
+    run_query(index, query_str, top_k, **options) -> [result, ...]
+    prefix_terms(index, prefix, limit) -> [(term, notes), ...]
+    file_outline(index, rel_path) -> outline dict or None
+    index_stats(index_path), compact_index(ai_dir, index_path)
+    index_dir_name, schema_version (stored in the index manifest)
+
+"auto" picks tantivy when it can be imported, numpy otherwise.
+"""
+
+import importlib.util
+from types import SimpleNamespace
+
+from lsearch.corpus import INDEX_DIR_NAME, NP_INDEX_DIR_NAME
+from lsearch.publish import index_generation
+
+BACKENDS = ("auto", "tantivy", "numpy")
+
+
+def resolve(name="auto"):
+    """Concrete backend name for `name` ("auto" probes for tantivy)."""
+    if name != "auto":
+        return name
+    return "tantivy" if importlib.util.find_spec("tantivy") else "numpy"
+
+
+def index_dir_name(name="auto"):
+    """Index directory of a backend, without importing it."""
+    if resolve(name) == "numpy":
+        return NP_INDEX_DIR_NAME
+    return INDEX_DIR_NAME
+
+
+def load(name="auto"):
+    """Import and return the backend namespace for `name`."""
+    name = resolve(name)
+    if name == "tantivy":
+        from lsearch import engine, query, stats, suggest
+        return SimpleNamespace(
+            name=name,
+            index_dir_name=engine.INDEX_DIR_NAME,
+            schema_version=engine.SCHEMA_VERSION,
+            build_index=engine.build_index,
+            open_index=engine.open_index,
+            index_generation=index_generation,
+            run_query=query.run_query,
+            prefix_terms=suggest.tantivy_prefix_terms,
+            file_outline=query.file_outline,
+            index_stats=stats.index_stats,
+            compact_index=stats.compact_index,
+        )
+    if name == "numpy":
+        from lsearch import npbm25, npbuild, suggest
+        return SimpleNamespace(
+            name=name,
+            index_dir_name=npbm25.INDEX_DIR_NAME,
+            schema_version=npbm25.FORMAT_VERSION,
+            build_index=npbuild.build_index,
+            open_index=npbm25.open_index,
+            index_generation=index_generation,
+            run_query=npbm25.run_query,
+            prefix_terms=suggest.array_prefix_terms,
+            file_outline=npbm25.file_outline,
+            index_stats=npbm25.index_stats,
+            compact_index=npbm25.compact_index,
+        )
+    raise ValueError(f"unknown backend: {name!r}")
@@ -0,0 +1,102 @@
+"""batch.py — many queries against one open index, streamed as JSONL.
+
+Input is one query per line: plain text, or a JSON object with
+per-query overrides:
+
+    session end
+    {"query": "git sync", "k": 3, "sections": true, "snippet": 120}
+
+Keys: query (required), k, sections, collapse, snippet (chars), dir
+(string or list), since, until, recent, boost ({"title": 5}), outline.
+Missing keys take the command-line values. Each query produces one output line
+
+    {"i": 0, "query": "...", "k": 5, "ms": 1.9, "results": [...]}
+
+or {"i": .., "query": .., "error": "..."} — a bad line doesn't stop the
+batch. With merge=True a final {"merged": [...], "queries": n} line
+holds the top-k across all queries, one entry per hit location with its
+best score and the indexes of the queries that found it.
+"""
+
+import json
+import sys
+import time
+
+from lsearch.backends import load as load_backend
+
+_OPTION_KEYS = {"sections": "sections", "collapse": "collapse",
+                "snippet": "snippet_chars", "dir": "dirs", "since": "since",
+                "until": "until", "recent": "recent", "boost": "boosts",
+                "outline": "outline"}
+
+
+def parse_line(line, top_k, options):
+    """(query, k, options) for one input line; raises ValueError."""
+    line = line.strip()
+    if not line.startswith("{"):
+        return line, top_k, dict(options)
+    spec = json.loads(line)
+    query = spec.pop("query", None)
+    if not isinstance(query, str) or not query.strip():
+        raise ValueError("missing \"query\"")
+    k = int(spec.pop("k", top_k))
+    merged = dict(options)
+    for key, value in spec.items():
+        if key not in _OPTION_KEYS:
+            raise ValueError(f"unknown key: {key!r}")
+        if key == "dir" and isinstance(value, str):
+            value = [value]
+        merged[_OPTION_KEYS[key]] = value
+    return query, k, merged
+
+
+def _hit_key(result):
+    return (result["path"], result.get("anchor", ""))
+
+
+def run_batch(backend, index, lines, top_k=5, options=None, merge=False):
+    """Yield one output dict per non-blank input line (plus merged)."""
+    options = options or {}
+    best = {}
+    i = -1
+    for line in lines:
+        if not line.strip():
+            continue
+        i += 1
+        try:
+            query, k, query_options = parse_line(line, top_k, options)
+            started = time.perf_counter()
+            results = backend.run_query(index, query, k, **query_options)
+            ms = (time.perf_counter() - started) * 1000
+        except Exception as e:
+            yield {"i": i, "query": line.strip(), "error": str(e)}
+            continue
+        yield {"i": i, "query": query, "k": k, "ms": round(ms, 2),
+               "results": results}
+        if merge:
+            for result in results:
+                key = _hit_key(result)
+                kept = best.get(key)
+                if kept is None:
+                    best[key] = dict(result, queries=[i])
+                    continue
+                kept["queries"].append(i)
+                if result["score"] > kept["score"]:
+                    best[key] = dict(result, queries=kept["queries"])
+    if merge:
+        merged = sorted(best.values(), key=lambda r: -r["score"])[:top_k]
+        yield {"merged": merged, "queries": i + 1}
+
+
+def batch_search(ai_dir, lines, top_k=5, backend="auto", merge=False,
+                 **options):
+    """Run many queries against one open index, printing JSONL as it goes."""
+    sys.stdout.reconfigure(encoding="utf-8")
+    backend = load_backend(backend)
+    index_path = ai_dir / backend.index_dir_name
+    if not index_path.exists():
+        print("No index found. Run --build first.", file=sys.stderr)
+        return
+    index = backend.open_index(index_path)
+    for record in run_batch(backend, index, lines, top_k, options, merge):
+        print(json.dumps(record, ensure_ascii=False), flush=True)
@@ -0,0 +1,137 @@
+"""bodystore.py — document bodies kept outside the tantivy doc store.
+
+The stripped body is only needed for snippets, yet stored in tantivy it
+was most of the doc store, and every searcher.doc() decompressed it.
+Bodies live here instead, in bodies.sqlite inside the index directory:
+one row per file holding the file body and all its section bodies as a
+single zlib-compressed JSON list. Sections repeat the file's text, so
+compressing them together stores it roughly once. The row also holds
+the file's outline (outline.py), uncompressed: it is small and bounded,
+and --outline reads it by path without touching the bodies. Each
+tantivy document carries row * SLOT_SPAN + position in its body_id fast
+field, so a snippet costs one fast-field read plus one primary-key
+lookup, and only for the hits being shown. The aliases table maps each member of a group
+of copies (dedup.py), the canonical file included, to the canonical
+path it is indexed under, with the member's mtime for date filters.
+
+The store is written by build_index alongside the tantivy writer and
+committed right after it.
+"""
+
+import json
+import sqlite3
+import zlib
+
+BODY_STORE_NAME = "bodies.sqlite"
+SLOT_SPAN = 1 << 20   # max bodies (file + sections) per row
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bodies (
+    id INTEGER PRIMARY KEY, path TEXT NOT NULL, blob BLOB NOT NULL,
+    outline TEXT);
+CREATE INDEX IF NOT EXISTS bodies_path ON bodies (path);
+CREATE TABLE IF NOT EXISTS aliases (
+    path TEXT PRIMARY KEY, canonical TEXT NOT NULL, modified REAL);
+CREATE INDEX IF NOT EXISTS aliases_canonical ON aliases (canonical);
+"""
+
+
+class BodyStore:
+    """Compressed body text, one row per file, keyed by integer ids."""
+
+    def __init__(self, index_path):
+        self.path = index_path / BODY_STORE_NAME
+        self._db = sqlite3.connect(str(self.path))
+        self._db.executescript(_SCHEMA)
+
+    def add_file(self, rel_path, bodies, outline=None):
+        """Store a file's bodies (and outline JSON); returns their ids for
+        body_id, in order."""
+        blob = zlib.compress(
+            json.dumps(bodies, ensure_ascii=False).encode("utf-8"), 9)
+        cursor = self._db.execute(
+            "INSERT INTO bodies (path, blob, outline) VALUES (?, ?, ?)",
+            (rel_path, blob, outline))
+        return [cursor.lastrowid * SLOT_SPAN + i for i in range(len(bodies))]
+
+    def delete_path(self, rel_path):
+        """Drop every body (file + sections) of one file."""
+        self._db.execute("DELETE FROM bodies WHERE path = ?", (rel_path,))
+
+    def get_many(self, ids):
+        """{id: body} for the given ids; missing ids are left out."""
+        ids = [i for i in set(ids) if i is not None]
+        rows = sorted({i // SLOT_SPAN for i in ids})
+        if not rows:
+            return {}
+        marks = ",".join("?" * len(rows))
+        blobs = {
+            row: json.loads(zlib.decompress(blob))
+            for row, blob in self._db.execute(
+                f"SELECT id, blob FROM bodies WHERE id IN ({marks})", rows)
+        }
+        found = {}
+        for i in ids:
+            bodies = blobs.get(i // SLOT_SPAN)
+            if bodies is not None and i % SLOT_SPAN < len(bodies):
+                found[i] = bodies[i % SLOT_SPAN]
+        return found
+
+    def outlines(self, paths):
+        """{path: outline dict} for the given paths that have one."""
+        paths = list(set(paths))
+        if not paths:
+            return {}
+        marks = ",".join("?" * len(paths))
+        return {
+            path: json.loads(outline)
+            for path, outline in self._db.execute(
+                f"SELECT path, outline FROM bodies WHERE path IN ({marks}) "
+                "AND outline IS NOT NULL", paths)
+        }
+
+    def set_aliases(self, groups):
+        """Replace the alias table ({canonical: [[path, mtime], ...]})."""
+        self._db.execute("DELETE FROM aliases")
+        self._db.executemany(
+            "INSERT INTO aliases (path, canonical, modified) VALUES (?, ?, ?)",
+            [(path, canonical, mtime) for canonical, members in groups.items()
+             for path, mtime in members])
+
+    def aliases(self, paths):
+        """{canonical path: [alias paths]} for the given canonical paths."""
+        paths = list(set(paths))
+        if not paths:
+            return {}
+        marks = ",".join("?" * len(paths))
+        found = {}
+        for path, canonical in self._db.execute(
+                f"SELECT path, canonical FROM aliases WHERE canonical IN "
+                f"({marks}) AND path != canonical ORDER BY path", paths):
+            found.setdefault(canonical, []).append(path)
+        return found
+
+    def canonical(self, path):
+        """Path a folded copy is indexed under; path itself otherwise."""
+        row = self._db.execute(
+            "SELECT canonical FROM aliases WHERE path = ?", (path,)).fetchone()
+        return row[0] if row else path
+
+    def groups(self):
+        """The whole alias table as {canonical: [[path, mtime], ...]},
+        canonical first."""
+        found = {}
+        for path, canonical, mtime in self._db.execute(
+                "SELECT path, canonical, modified FROM aliases "
+                "ORDER BY canonical, path != canonical, path"):
+            found.setdefault(canonical, []).append([path, mtime])
+        return found
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,141 @@
+"""cache.py — on-disk LRU cache of query results.
+
+Standard library only (sqlite3), so a cached query needs neither the
+search engine nor the warm server. The cache lives next to the index
+(query_cache.sqlite in the index directory) and every entry is tagged
+with the commit token of the index it was computed from:
+
+    tantivy  "<dir inode>:<opstamp from meta.json>"
+    numpy    "<dir inode>:<manifest mtime_ns>"   (written only on rebuild)
+
+A lookup only hits when the tag matches the current token, so any
+commit from build_index invalidates the cache without telling it; a
+full rebuild deletes the directory and the cache with it. Stale entries
+are dropped on the next write, then least-recently-used ones until the
+cache is under max_bytes. Hit/miss counters persist for --stats.
+
+Queries whose results move with the clock rather than with commits
+(--since/--until 7d, --recent) are not cached (cacheable).
+"""
+
+import json
+import sqlite3
+import time
+
+from lsearch.filters import is_relative
+from lsearch.manifest import MANIFEST_NAME
+
+CACHE_NAME = "query_cache.sqlite"
+CACHE_MAX_BYTES = 4_000_000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY, tag TEXT, results TEXT, size INTEGER, used REAL);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER);
+"""
+
+
+def commit_token(index_path):
+    """String that changes with every commit to the index, or None."""
+    try:
+        inode = index_path.stat().st_ino
+        meta = index_path / "meta.json"
+        if meta.exists():
+            with open(meta, "r", encoding="utf-8") as f:
+                return f"{inode}:{json.load(f).get('opstamp')}"
+        return f"{inode}:{(index_path / MANIFEST_NAME).stat().st_mtime_ns}"
+    except (OSError, ValueError):
+        return None
+
+
+def cache_key(query_str, top_k, backend, options):
+    """Whitespace-normalized query plus everything that shapes results."""
+    return json.dumps([" ".join(query_str.split()), int(top_k), backend,
+                       sorted(options.items())], ensure_ascii=False)
+
+
+def cacheable(options):
+    """False if the results depend on the current time as well."""
+    return not options.get("recent") and not any(
+        is_relative(options.get(name)) for name in ("since", "until"))
+
+
+class QueryCache:
+    """LRU result cache in one sqlite file; errors degrade to misses."""
+
+    def __init__(self, index_path, max_bytes=CACHE_MAX_BYTES):
+        self.path = index_path / CACHE_NAME
+        self.max_bytes = max_bytes
+        self._db = None
+
+    def _conn(self):
+        if self._db is None:
+            self._db = sqlite3.connect(str(self.path), timeout=1.0)
+            self._db.executescript(_SCHEMA)
+        return self._db
+
+    def _count(self, db, name):
+        db.execute("INSERT INTO counters VALUES (?, 1) ON CONFLICT(name) "
+                   "DO UPDATE SET value = value + 1", (name,))
+
+    def get(self, key, tag):
+        """Cached results for key at this tag, or None (counted as a miss)."""
+        try:
+            with self._conn() as db:
+                row = db.execute("SELECT results FROM entries "
+                                 "WHERE key = ? AND tag = ?",
+                                 (key, tag)).fetchone()
+                self._count(db, "hits" if row else "misses")
+                if row is None:
+                    return None
+                db.execute("UPDATE entries SET used = ? WHERE key = ?",
+                           (time.time(), key))
+                return json.loads(row[0])
+        except sqlite3.Error:
+            return None
+
+    def put(self, key, tag, results):
+        """Store results, then evict stale and least-recently-used entries."""
+        payload = json.dumps(results, ensure_ascii=False)
+        try:
+            with self._conn() as db:
+                db.execute("DELETE FROM entries WHERE tag != ?", (tag,))
+                db.execute("INSERT OR REPLACE INTO entries VALUES "
+                           "(?, ?, ?, ?, ?)",
+                           (key, tag, payload, len(payload), time.time()))
+                total = db.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                if total > self.max_bytes:
+                    for old_key, size in db.execute(
+                            "SELECT key, size FROM entries "
+                            "ORDER BY used").fetchall():
+                        db.execute("DELETE FROM entries WHERE key = ?",
+                                   (old_key,))
+                        self._count(db, "evictions")
+                        total -= size
+                        if total <= self.max_bytes:
+                            break
+        except sqlite3.Error:
+            pass
+
+    def stats(self):
+        """Entry count, payload bytes and counters, or None if no cache."""
+        if not self.path.exists():
+            return None
+        try:
+            db = self._conn()
+            entries, size = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+            counters = dict(db.execute("SELECT name, value FROM counters"))
+        except sqlite3.Error:
+            return None
+        return {"entries": entries, "bytes": size,
+                "hits": counters.get("hits", 0),
+                "misses": counters.get("misses", 0),
+                "evictions": counters.get("evictions", 0)}
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,67 @@
+"""client.py — talk to a warm `local_search.py --serve` process.
+
+Standard library only: a query answered by the server never imports
+tantivy or opens the index in this process.
+
+Protocol: one JSON object per line each way over a Unix socket.
+    -> {"op": "search", "query": "session end", "top_k": 5,
+        "options": {...}}     # extra run_query keyword arguments
+    <- {"ok": true, "results": [{"score": .., "title": .., ...}]}
+    -> {"op": "suggest", "prefix": "session en", "limit": 10}
+    <- {"ok": true, "results": [["session end", 12], ...]}
+    -> {"op": "outline", "path": "workflows/git_sync.md"}
+    <- {"ok": true, "outline": {"lines": .., "headings": [..], ...}}
+
+A refusal ({"ok": false, "error": ..}: another backend, a bad option)
+is treated like no server: callers use ask() and answer in-process,
+which reports a real error itself.
+"""
+
+import hashlib
+import json
+import pathlib
+import socket
+import tempfile
+
+CONNECT_TIMEOUT = 0.2   # seconds; a live server accepts immediately
+REQUEST_TIMEOUT = 30
+
+
+def socket_path(ai_dir):
+    """Per-root socket path, kept short for the AF_UNIX path length cap."""
+    digest = hashlib.sha1(str(ai_dir.resolve()).encode("utf-8")).hexdigest()
+    return pathlib.Path(tempfile.gettempdir()) / f"local_search-{digest[:12]}.sock"
+
+
+def send_request(ai_dir, request):
+    """Send one request; returns the decoded reply, or None if no server."""
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    path = socket_path(ai_dir)
+    if not path.exists():
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(CONNECT_TIMEOUT)
+        sock.connect(str(path))
+        sock.settimeout(REQUEST_TIMEOUT)
+        payload = json.dumps(request, ensure_ascii=False) + "\n"
+        sock.sendall(payload.encode("utf-8"))
+        with sock.makefile("rb") as f:
+            line = f.readline()
+    except OSError:
+        return None
+    finally:
+        sock.close()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+def ask(ai_dir, request):
+    """The reply if a server answered ok, else None (no server, or it
+    refused the request)."""
+    response = send_request(ai_dir, request)
+    if response is None or not response.get("ok"):
+        return None
+    return response
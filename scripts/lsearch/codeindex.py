@@ -0,0 +1,146 @@
+"""codeindex.py — code-aware text for the index: identifiers, .py, .yaml.
+
+Standard library only (ast, re). Markdown bodies drop fenced and inline
+code, so names that only appear in code were unsearchable. Code text now
+goes to its own "code" field, rewritten by code_terms() so a query finds
+an identifier whole or by its parts:
+
+    build_index   -> build_index build index
+    OpenIndex     -> openindex open index
+    --heap-mb     -> heap-mb heap mb
+
+Two more kinds of files are indexed (corpus.CODE_DIRS):
+
+    scripts/**/*.py    one section per class, function and method
+                       (heading = signature, body = docstring) and per
+                       argparse flag (body = help text), via ast
+    configs/*.yaml     one section per top-level key
+
+scan_python/scan_yaml return the same shape pipeline.prepare_file builds
+for markdown, so hits point at file#symbol (Lstart-end) like any section.
+"""
+
+import ast
+import re
+
+_IDENT = re.compile(r"[A-Za-z_][A-Za-z0-9_\-]*")
+_PARTS = re.compile(r"[A-Z]+(?=[A-Z][a-z]|\d|\b)|[A-Z]?[a-z]+|[A-Z]+|\d+")
+_YAML_KEY = re.compile(r"^[ \t]*-?[ \t]*([A-Za-z_][\w\-]*)[ \t]*:", re.MULTILINE)
+
+
+def identifier_parts(identifier):
+    """"build_index" -> ["build", "index"]; "HTTPServer" -> ["HTTP", "Server"]."""
+    return [p for chunk in re.split(r"[_\-]+", identifier)
+            for p in _PARTS.findall(chunk)]
+
+
+def code_terms(text):
+    """Identifiers in text, lowercased, each followed by its parts."""
+    terms = []
+    for ident in _IDENT.findall(text):
+        ident = ident.strip("-")
+        if not ident:
+            continue
+        terms.append(ident.lower())
+        parts = identifier_parts(ident)
+        if len(parts) > 1:
+            terms.extend(p.lower() for p in parts)
+    return " ".join(terms)
+
+
+def _doc(fields):
+    """Fill the keys every document shape needs."""
+    return dict({"title": "", "body": "", "code": "", "description": ""},
+                **fields)
+
+
+def _section(heading, body, code, anchor, chain, line_start, line_end,
+             text):
+    return _doc({
+        "title": heading, "body": body, "code": code_terms(code),
+        "anchor": anchor, "chain": chain, "line_start": line_start,
+        "line_end": line_end, "size": len(text.encode("utf-8")),
+    })
+
+
+def _flag_sections(tree, lines):
+    """One section per parser.add_argument("--flag", ..., help=...)."""
+    sections = []
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Call)
+                and isinstance(node.func, ast.Attribute)
+                and node.func.attr == "add_argument"):
+            continue
+        flags = [a.value for a in node.args
+                 if isinstance(a, ast.Constant) and isinstance(a.value, str)]
+        if not flags:
+            continue
+        help_text = next(
+            (k.value.value for k in node.keywords
+             if k.arg == "help" and isinstance(k.value, ast.Constant)), "")
+        text = "\n".join(lines[node.lineno - 1:node.end_lineno])
+        sections.append(_section(
+            " / ".join(flags), help_text, " ".join(flags), flags[-1],
+            "argparse " + " / ".join(flags), node.lineno, node.end_lineno,
+            text))
+    return sections
+
+
+def _symbol_sections(body, lines, chain=()):
+    """Sections for the classes and functions in an ast body, recursively."""
+    sections = []
+    for node in body:
+        if isinstance(node, ast.ClassDef):
+            heading = f"class {node.name}"
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            heading = f"def {node.name}({ast.unparse(node.args)})"
+        else:
+            continue
+        names = [*chain, node.name]
+        text = "\n".join(lines[node.lineno - 1:node.end_lineno])
+        decorators = " ".join(ast.unparse(d) for d in node.decorator_list)
+        sections.append(_section(
+            heading, ast.get_docstring(node) or "",
+            f"{heading} {decorators}", ".".join(names),
+            " > ".join([*chain, heading]), node.lineno, node.end_lineno,
+            text))
+        sections.extend(_symbol_sections(node.body, lines, names))
+    return sections
+
+
+def scan_python(source, name):
+    """(file fields, section fields) for a Python source file."""
+    tree = ast.parse(source)
+    lines = source.splitlines()
+    module_doc = ast.get_docstring(tree) or ""
+    sections = _symbol_sections(tree.body, lines) + _flag_sections(tree, lines)
+    sections.sort(key=lambda s: s["line_start"])
+    title = module_doc.strip().split("\n", 1)[0] or name
+    fields = _doc({
+        "title": title,
+        "body": "\n".join([module_doc] + [s["body"] for s in sections]),
+        "code": " ".join(s["code"] for s in sections),
+        "description": module_doc.strip().split("\n\n", 1)[0],
+    })
+    return fields, sections
+
+
+def scan_yaml(text, name):
+    """(file fields, section fields) for a YAML file: one per top-level key."""
+    lines = text.splitlines()
+    starts = [i for i, line in enumerate(lines)
+              if _YAML_KEY.match(line) and line[:1] not in " \t-"]
+    sections = []
+    for n, start in enumerate(starts):
+        end = starts[n + 1] if n + 1 < len(starts) else len(lines)
+        block = "\n".join(lines[start:end])
+        key = _YAML_KEY.match(lines[start]).group(1)
+        sections.append(_section(
+            key, block, " ".join(_YAML_KEY.findall(block)), key, key,
+            start + 1, end, block))
+    fields = _doc({
+        "title": name,
+        "body": text,
+        "code": code_terms(" ".join(_YAML_KEY.findall(text))),
+    })
+    return fields, sections
@@ -0,0 +1,241 @@
+"""commands.py — the index maintenance commands of local_search.py.
+
+--stats, --compact, --suggest, --outline, --related, --export-snapshot
+/ --import-snapshot and --history searches: each loads what it needs,
+does one job and prints a report.
+"""
+
+import pathlib
+import sys
+
+from lsearch.backends import load as load_backend
+from lsearch.cache import QueryCache
+
+
+def show_stats(ai_dir, backend="auto"):
+    """Show index statistics."""
+    sys.stdout.reconfigure(encoding="utf-8")
+    backend = load_backend(backend)
+    index_path = ai_dir / backend.index_dir_name
+
+    if not index_path.exists():
+        print("No index found. Run --build first.")
+        return
+
+    st = backend.index_stats(index_path)
+    print(f"Index Stats ({backend.name}):")
+    print(f"  Documents indexed: {st['file_docs']} files, "
+          f"{st['section_docs']} sections ({st['num_docs']} total)")
+    print(f"  Segments:          {st['segments']} "
+          f"({st['deleted']} deleted docs, {st['deleted_ratio']:.1%})")
+    print(f"  Last commit:       {st['last_commit'] or '?'}")
+    print(f"  Index size:        {st['index_size'] / 1024:.1f} KB"
+          + (f" (body store {st['body_store_size'] / 1024:.1f} KB)"
+             if st.get("body_store_size") else ""))
+    if st["aliases"]:
+        print(f"  Deduplicated:      {st['aliases']} copied file(s), "
+              f"{st['alias_bytes'] / 1024:.1f} KB not indexed")
+    print(f"  Index path:        {index_path}")
+    print("  By directory:")
+    for top_dir, count in st["by_dir"].items():
+        print(f"    {top_dir:<24} {count}")
+
+    if st["file_docs"] != st["manifest_files"]:
+        print(f"\n  ⚠️  Mismatch: manifest lists {st['manifest_files']} files, "
+              f"index has {st['file_docs']}. Run --build --full.")
+
+    cache = QueryCache(index_path).stats()
+    if cache:
+        lookups = cache["hits"] + cache["misses"]
+        rate = cache["hits"] / lookups if lookups else 0.0
+        print(f"\n  Query cache:       {cache['entries']} entries, "
+              f"{cache['bytes'] / 1024:.1f} KB; {cache['hits']} hits / "
+              f"{cache['misses']} misses ({rate:.0%}), "
+              f"{cache['evictions']} evicted")
+
+
+def compact(ai_dir, backend="auto"):
+    """Merge segments and garbage-collect index files."""
+    sys.stdout.reconfigure(encoding="utf-8")
+    backend = load_backend(backend)
+    index_path = ai_dir / backend.index_dir_name
+    if not index_path.exists():
+        print("No index found. Run --build first.")
+        return
+
+    before, after = backend.compact_index(ai_dir, index_path)
+    for label, info in (("Before", before), ("After", after)):
+        print(f"  {label + ':':<8} {info['segments']} segments, "
+              f"{info['deleted']} deleted docs ({info['deleted_ratio']:.1%})")
+
+
+def show_suggestions(ai_dir, prefix, limit=10, backend="auto",
+                     use_server=True):
+    """Print completions of the last word of prefix, most common first."""
+    from lsearch.api import Index
+    from lsearch.client import ask
+    from lsearch.suggest import split_prefix
+
+    response = None
+    if use_server:
+        response = ask(ai_dir, {"op": "suggest", "prefix": prefix,
+                                "limit": limit, "backend": backend})
+    if response is None:
+        results = Index(ai_dir, backend, verbose=True).suggest(prefix, limit)
+    else:
+        results = response["results"]
+    if not results:
+        print(f"No indexed words start with: {split_prefix(prefix)[1]}")
+        return
+    width = max(len(text) for text, _ in results)
+    for text, count in results:
+        print(f"  {text:<{width}}  {count} note{'s' if count != 1 else ''}")
+
+
+def _snapshot_path(ai_dir, backend, path):
+    from lsearch.snapshot import snapshot_name
+
+    return pathlib.Path(path) if path else ai_dir / snapshot_name(
+        backend.index_dir_name)
+
+
+def export_snapshot(ai_dir, backend="auto", path=None):
+    """Write the index to one archive (default: next to the notes)."""
+    from lsearch.snapshot import export_snapshot as export
+
+    backend = load_backend(backend)
+    index_path = ai_dir / backend.index_dir_name
+    out_path = _snapshot_path(ai_dir, backend, path)
+    if not index_path.exists():
+        print("No index found. Run --build first.")
+        return
+    try:
+        header = export(index_path, out_path, backend.name,
+                        backend.schema_version)
+    except (ValueError, OSError) as e:
+        print(f"ERROR: {e}")
+        return
+    print(f"Snapshot written: {out_path} ({out_path.stat().st_size / 1024:.1f}"
+          f" KB, {header['num_files']} files, {len(header['files'])} "
+          f"index files, last commit {header['last_commit']})")
+
+
+def import_snapshot(ai_dir, backend="auto", path=None, workers=None,
+                    log=print):
+    """Replace the index with a snapshot, then catch up on changed files.
+
+    Returns False (after logging why) if the snapshot was not usable;
+    log gets the report lines (print by default).
+    """
+    import tarfile
+    from lsearch.snapshot import import_snapshot as restore
+
+    backend = load_backend(backend)
+    index_path = ai_dir / backend.index_dir_name
+    snapshot_path = _snapshot_path(ai_dir, backend, path)
+    try:
+        header = restore(snapshot_path, index_path, backend.name,
+                         backend.schema_version)
+    except (ValueError, OSError, tarfile.TarError) as e:
+        log(f"ERROR: snapshot {snapshot_path}: {e}")
+        return False
+    log(f"Snapshot imported: {header['num_files']} files as of "
+        f"{header['last_commit']} — catching up")
+    backend.build_index(ai_dir, workers=workers, log=log)
+    return True
+
+
+def show_history(ai_dir, query_str, top_k=5, as_of=None, first_seen=False):
+    """Search the git history index and print one line per version."""
+    from lsearch.history import search_history
+
+    sys.stdout.reconfigure(encoding="utf-8")
+    try:
+        results = search_history(ai_dir, query_str, top_k, as_of, first_seen)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return []
+    if results is None:
+        print("No history index. Run --build --history first.")
+        return []
+    if not results:
+        print(f"No history results for: {query_str}")
+        return []
+    label = f"as of {as_of}" if as_of else (
+        "first appearance" if first_seen else "all versions")
+    print(f"History results for: {query_str}  ({label})\n")
+    for i, r in enumerate(results):
+        score = "" if r["score"] is None else f"[{r['score']:.2f}] "
+        print(f"  {i+1}. {score}{r['date'][:10]}  {r['path']}  "
+              f"({r['commit'][:8]}, blob {r['blob'][:8]})")
+        print(f"     {r['title']}")
+    print()
+    return results
+
+
+def update_related(ai_dir, force=False, workers=None, prepared=None):
+    """Refresh the --related table after a build (needs numpy).
+
+    prepared: the documents the build collected (Index.update collect=).
+    """
+    import importlib.util
+    if importlib.util.find_spec("numpy") is None:
+        return
+    from lsearch.related import build_related
+
+    done = build_related(ai_dir, force=force, workers=workers,
+                         prepared=prepared)
+    if done:
+        print(f"Related notes: {'full' if done['full'] else 'incremental'} "
+              f"update, {done['changed']} changed, {done['removed']} removed "
+              f"in {done['seconds']:.2f}s")
+
+
+def _note_key(ai_dir, note):
+    """Root-relative posix path for a note given that way or on disk."""
+    path = pathlib.Path(note)
+    if path.exists():
+        path = path.resolve()
+        if path.is_relative_to(ai_dir.resolve()):
+            return path.relative_to(ai_dir.resolve()).as_posix()
+    return note
+
+
+def show_outline(ai_dir, note, backend="auto", use_server=True):
+    """Print the outline stored in the index for one file."""
+    from lsearch.api import Index
+    from lsearch.client import ask
+    from lsearch.outline import format_outline
+
+    note = _note_key(ai_dir, note)
+    response = None
+    if use_server:
+        response = ask(ai_dir, {"op": "outline", "path": note,
+                                "backend": backend})
+    if response is None:
+        outline = Index(ai_dir, backend, verbose=True).outline(note)
+    else:
+        outline = response["outline"]
+    if outline is None:
+        print(f"{note} is not in the index. Run --build.")
+        return
+    print(f"Outline: {note}\n")
+    print("\n".join(format_outline(outline, indent="  ")))
+    print()
+
+
+def show_related(ai_dir, note, top_k=5):
+    """Print the precomputed nearest neighbours of one note."""
+    sys.stdout.reconfigure(encoding="utf-8")
+    from lsearch.related import related_notes
+
+    note = _note_key(ai_dir, note)
+    results = related_notes(ai_dir, note, top_k)
+    if results is None:
+        print(f"{note} is not in the related-notes table. Run --build.")
+        return
+    print(f"Related to: {note}\n")
+    for score, rel_path, title in results:
+        print(f"  [{score:.2f}] {rel_path}")
+        print(f"     {title}")
+    print()
@@ -0,0 +1,159 @@
+"""corpus.py — which files get indexed and how their text is cleaned.
+
+Pure standard library: safe to import from the thin client without
+paying for the tantivy import.
+"""
+
+import os
+import pathlib
+import re
+
+# Single-pass scanner shared with other scripts (scripts/md_scan.py);
+# callers that need title and body should call it once themselves.
+from md_scan import scan_markdown
+
+
+# --- Configuration ---
+
+# Directories to index (relative to ai_evolution root)
+INDEX_DIRS = [
+    ".",              # Root md files (project_context, skills, etc.)
+    "session_notes",  # Session notes and sub-dirs
+    "readings",       # Research output
+    "workflows",      # Workflow definitions
+]
+
+# File extensions to index
+INDEX_EXTENSIONS = {".md"}
+
+# Code and config indexed alongside the notes (see lsearch/codeindex.py):
+# directory -> extensions, searched recursively
+CODE_DIRS = {
+    "scripts": {".py"},
+    "configs": {".yaml", ".yml"},
+}
+
+# Files/dirs to skip
+SKIP_PATTERNS = {".git", "__pycache__", ".bm25_index", "node_modules"}
+
+# Index location
+INDEX_DIR_NAME = ".search_index"
+NP_INDEX_DIR_NAME = ".search_index_np"   # --backend numpy
+RELATED_DIR_NAME = ".search_index_related"   # --related neighbour table
+HISTORY_DIR_NAME = ".search_index_history"   # --history (git blobs)
+
+# Headings at this level or above start their own section document
+SECTION_MAX_LEVEL = 3
+
+# CJK scripts (Han, kana, Hangul). Text in these scripts has no spaces,
+# so the en_stem fields see a whole run as one token; queries containing
+# them are routed to the *_cjk fields (see engine.register_analyzers).
+CJK_CLASS = (
+    "[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af"
+    "\uf900-\ufaff\U00020000-\U0002ffff]"
+)
+CJK_RE = re.compile(CJK_CLASS)
+
+
+def has_cjk(text):
+    """True if text contains any CJK character."""
+    return CJK_RE.search(text) is not None
+
+
+FRONTMATTER_RE = re.compile(
+    r"\A---[ \t]*\r?\n(.*?)\r?\n---[ \t]*(?:\r?\n|\Z)", re.DOTALL)
+
+
+def parse_frontmatter(text):
+    """Top-level `key: value` scalars of a leading --- block (no YAML lib).
+
+    Nested values, lists and block scalars are skipped; quotes around a
+    value are dropped.
+    """
+    match = FRONTMATTER_RE.match(text)
+    if not match:
+        return {}
+    meta = {}
+    for line in match.group(1).splitlines():
+        if not line or line[0] in " \t#-":
+            continue
+        key, sep, value = line.partition(":")
+        value = value.strip()
+        if not sep or not value or value[0] in "|>[{":
+            continue
+        if len(value) > 1 and value[0] == value[-1] and value[0] in "\"'":
+            value = value[1:-1]
+        meta[key.strip()] = value
+    return meta
+
+
+def strip_markdown(text):
+    """Remove markdown formatting for cleaner indexing."""
+    return scan_markdown(text).body
+
+
+def extract_title(content):
+    """Extract first heading as document title."""
+    return scan_markdown(content).title
+
+
+def collapse_snippet(text, spans):
+    """Snippet text on one line, with its highlight spans moved to match.
+
+    Markdown bodies are already collapsed; code bodies (.py/.yaml) keep
+    their newlines and indentation until here.
+    """
+    out, where = [], []
+    for ch in text:
+        where.append(len(out))
+        if not ch.isspace():
+            out.append(ch)
+        elif out and out[-1] != " ":
+            out.append(" ")
+    where.append(len(out))
+    collapsed = "".join(out).rstrip()
+    end = len(collapsed)
+    return collapsed, [[min(where[s], end), min(where[e], end)]
+                       for s, e in spans]
+
+
+def is_indexed_path(rel_path):
+    """Would collect_files pick up this root-relative posix path?"""
+    parts = rel_path.split("/")
+    if any(part in SKIP_PATTERNS for part in parts[:-1]):
+        return False
+    suffix = pathlib.PurePosixPath(rel_path).suffix.lower()
+    if suffix in CODE_DIRS.get(parts[0], ()):
+        return True
+    if suffix not in INDEX_EXTENSIONS:
+        return False
+    return any(
+        d == "." or rel_path.startswith(d.rstrip("/") + "/") for d in INDEX_DIRS
+    )
+
+
+def collect_files(ai_dir):
+    """Collect all markdown files (and CODE_DIRS files) to index."""
+    files = []
+    targets = [(d, INDEX_EXTENSIONS) for d in INDEX_DIRS] + list(
+        CODE_DIRS.items())
+    for subdir, extensions in targets:
+        target = ai_dir / subdir
+        if not target.exists():
+            continue
+        for root, dirs, filenames in os.walk(target):
+            # Skip unwanted directories
+            dirs[:] = [d for d in dirs if d not in SKIP_PATTERNS]
+            for fname in filenames:
+                fpath = pathlib.Path(root) / fname
+                if fpath.suffix.lower() in extensions:
+                    files.append(fpath)
+    # Deduplicate (root "." may overlap with subdirs)
+    seen = set()
+    unique = []
+    for f in files:
+        resolved = f.resolve()
+        if resolved not in seen:
+            seen.add(resolved)
+            unique.append(f)
+    return unique
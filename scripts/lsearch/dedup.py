@@ -0,0 +1,202 @@
+"""dedup.py — index mirrored files once, as one document with aliases.
+
+A workflow and its condensed copy under .agent/workflows/, or a note
+copied between folders, would otherwise be indexed twice and fill the
+top-k with the same hit. Workers (pipeline.prepare_file) hash each
+file's normalized text — frontmatter dropped, lowercased, whitespace
+collapsed — into the manifest entry as "norm", and sketch it for
+near-duplicate checks.
+
+The first file with a given norm is canonical and indexed as usual;
+later ones get "alias_of": <canonical path> in the manifest and no
+documents. Hits on the canonical file carry "aliases": the other paths
+with the same text. When a canonical file changes or is removed, its
+aliases are prepared again and the first one left becomes canonical.
+
+--dir/--since/--until match a group when any copy is inside the window
+(matching_copies): the canonical file is let through the filter and the
+hit points at the copy that matched (relocate). Groups are stored with
+each member's mtime for this (alias_groups).
+
+fold_near (build --fold-near 0.9) also folds files whose 5-word shingle
+sets have an estimated Jaccard similarity of at least that much with a
+canonical file (bottom-k MinHash over crc32, SKETCH_SIZE hashes).
+Sketches are kept in the manifest only while folding is on; the
+threshold is stored there too and changing it rebuilds the index.
+"""
+
+import hashlib
+import re
+import zlib
+from collections import Counter
+
+from lsearch.filters import normalize_dir, parse_when
+
+SHINGLE_WORDS = 5
+SKETCH_SIZE = 64
+
+_FRONTMATTER = re.compile(r"\A---\n.*?\n---\n", re.DOTALL)
+
+
+def normalize(content):
+    return " ".join(_FRONTMATTER.sub("", content).lower().split())
+
+
+def norm_hash(normalized):
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def sketch(normalized):
+    """Bottom-k crc32 hashes of the word shingles, sorted."""
+    words = normalized.split()
+    count = max(1, len(words) - SHINGLE_WORDS + 1)
+    hashes = {zlib.crc32(" ".join(words[i:i + SHINGLE_WORDS]).encode("utf-8"))
+              for i in range(count)}
+    return sorted(hashes)[:SKETCH_SIZE]
+
+
+def similarity(a, b):
+    """Jaccard estimate of two bottom-k sketches."""
+    union = sorted(set(a) | set(b))[:SKETCH_SIZE]
+    if not union:
+        return 0.0
+    both = set(a) & set(b)
+    return sum(1 for h in union if h in both) / len(union)
+
+
+class Deduper:
+    """Decides, file by file during a build, which copy gets indexed."""
+
+    def __init__(self, old_files, fold_near=0.0):
+        self.fold_near = fold_near
+        self._canonical = {}   # norm -> path
+        self._sketches = {}    # canonical path -> sketch
+        self._by_hash = {}     # sketch hash -> {canonical paths}
+        for rel, entry in old_files.items():
+            if "norm" in entry and "alias_of" not in entry:
+                self.keep(rel, entry)
+
+    def release(self, old_files, paths):
+        """Forget paths as canonical copies; returns their aliases, which
+        have to be prepared again."""
+        paths = set(paths)
+        for rel in paths:
+            norm = old_files.get(rel, {}).get("norm")
+            if self._canonical.get(norm) == rel:
+                del self._canonical[norm]
+            for h in self._sketches.pop(rel, ()):
+                self._by_hash[h].discard(rel)
+        return [rel for rel, entry in old_files.items()
+                if entry.get("alias_of") in paths]
+
+    def keep(self, rel_path, entry):
+        """Register an indexed file as the canonical copy of its text."""
+        self._canonical.setdefault(entry["norm"], rel_path)
+        if self.fold_near and "sketch" in entry:
+            self._sketches[rel_path] = entry["sketch"]
+            for h in entry["sketch"]:
+                self._by_hash.setdefault(h, set()).add(rel_path)
+
+    def _nearest(self, sketch_):
+        """Most similar canonical file at or above fold_near, or None.
+
+        Only files sharing sketch hashes are compared, most shared first.
+        """
+        shared = Counter(p for h in sketch_ for p in self._by_hash.get(h, ()))
+        best, best_sim = None, self.fold_near
+        for path, _ in shared.most_common(8):
+            sim = similarity(sketch_, self._sketches[path])
+            if sim >= best_sim:
+                best, best_sim = path, sim
+        return best
+
+    def canonical_for(self, rel_path, entry):
+        """Path this file is a copy of, or None (it is indexed itself)."""
+        other = self._canonical.get(entry["norm"])
+        if other is None and self.fold_near and "sketch" in entry:
+            other = self._nearest(entry["sketch"])
+        if other is not None and other != rel_path:
+            return other
+        self.keep(rel_path, entry)
+        return None
+
+
+def fold_threshold(manifest, fold_near=None):
+    """Effective fold_near: the one asked for, else the index's own."""
+    stored = (manifest or {}).get("fold_near", 0.0)
+    return stored if fold_near is None else fold_near
+
+
+def alias_map(files):
+    """{canonical path: [alias paths]} from manifest files."""
+    aliases = {}
+    for rel, entry in sorted(files.items()):
+        if "alias_of" in entry:
+            aliases.setdefault(entry["alias_of"], []).append(rel)
+    return aliases
+
+
+def alias_groups(files):
+    """{canonical: [[path, mtime], ...]}, canonical first, for every file
+    with copies."""
+    return {
+        canonical: [[rel, files[rel].get("mtime", 0.0)]
+                    for rel in [canonical, *aliases]]
+        for canonical, aliases in alias_map(files).items()
+        if canonical in files
+    }
+
+
+def manifest_counts(files):
+    """Manifest file counts for index_stats: indexed files and aliases."""
+    aliased = [e for e in files.values() if "alias_of" in e]
+    return {
+        "manifest_files": len(files) - len(aliased),
+        "aliases": len(aliased),
+        "alias_bytes": sum(e.get("size", 0) for e in aliased),
+    }
+
+
+def summary(files):
+    """Build report line on folded copies, or None if there are none."""
+    counts = manifest_counts(files)
+    if not counts["aliases"]:
+        return None
+    return (f"Deduplicated: {counts['aliases']} copied file(s) indexed "
+            f"once ({counts['alias_bytes'] / 1024:.1f} KB not indexed)")
+
+
+def attach_aliases(results, aliases):
+    """Add "aliases" to results whose path has copies ({path: [...]})."""
+    for result in results:
+        if result["path"] in aliases:
+            result["aliases"] = aliases[result["path"]]
+    return results
+
+
+def matching_copies(groups, dirs=None, since=None, until=None):
+    """{canonical: [member paths inside the filters]} for the groups
+    (alias_groups shape) with at least one such member."""
+    prefixes = tuple(normalize_dir(d) + "/" for d in dirs or ())
+    start = parse_when(since).timestamp() if since else float("-inf")
+    end = parse_when(until, end=True).timestamp() if until else float("inf")
+    matches = {}
+    for canonical, members in groups.items():
+        inside = [rel for rel, mtime in members
+                  if start <= mtime <= end
+                  and (not prefixes or rel.startswith(prefixes))]
+        if inside:
+            matches[canonical] = inside
+    return matches
+
+
+def relocate(results, matches):
+    """Point hits whose own path is outside the filters at the first copy
+    inside them (matches from matching_copies); aliases follow."""
+    for result in results:
+        inside = matches.get(result["path"])
+        if inside and result["path"] not in inside:
+            group = [result["path"], *result.get("aliases", ())]
+            result["path"] = inside[0]
+            result["aliases"] = [rel for rel in group if rel != inside[0]]
+    return results
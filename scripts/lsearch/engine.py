@@ -0,0 +1,343 @@
+"""engine.py — the tantivy side of local_search: schema, build, open.
+
+Everything that needs `import tantivy` lives here so the thin client
+(client.py) can answer from a warm server without loading it.
+"""
+
+import sys
+import threading
+import time
+from datetime import datetime
+
+try:
+    import tantivy
+except ImportError:
+    print("ERROR: tantivy not installed. Run: pip install tantivy")
+    sys.exit(1)
+
+from lsearch.bodystore import BodyStore
+from lsearch.corpus import INDEX_DIR_NAME, collect_files, is_indexed_path
+from lsearch.dedup import Deduper, alias_groups, fold_threshold, summary
+from lsearch.manifest import (
+    load_manifest, plan_changes, save_manifest,
+)
+from lsearch.pipeline import iter_prepared
+from lsearch.publish import discard, new_generation, publish, writer_lock
+
+# Bump whenever build_schema() or document shaping changes;
+# an index built with another version gets a full rebuild.
+SCHEMA_VERSION = 11
+
+# Analyzer for the *_cjk fields: one token per CJK character, whole words
+# for everything else. The query parser turns a multi-token term into a
+# phrase query, so "会话结束" matches those four characters in sequence —
+# dictionary-free, and an indexed lookup instead of a grep.
+CJK_SCRIPTS = r"\p{Han}\p{Hiragana}\p{Katakana}\p{Hangul}"
+CJK_TOKEN_PATTERN = rf"[{CJK_SCRIPTS}]|[^\s\p{{P}}\p{{S}}{CJK_SCRIPTS}]+"
+
+# Analyzer for the code field: identifiers kept whole (snake_case,
+# --kebab-flags); codeindex.code_terms() has already appended their parts.
+CODE_TOKEN_PATTERN = r"[A-Za-z0-9_][A-Za-z0-9_\-]*"
+
+# Analyzer for the words field (--suggest): unstemmed, lowercased words;
+# snake_case identifiers stay whole so "build_" completes to "build_index"
+WORDS_TOKEN_PATTERN = r"\w+"
+
+# tantivy writer defaults (--heap-mb / --writer-threads override)
+WRITER_HEAP_SIZE = 128_000_000   # bytes, split across writer threads
+WRITER_THREADS = 0               # 0 = let tantivy pick
+
+
+def build_schema():
+    """Build the tantivy schema for markdown (and code) documents.
+
+    kind is "file" (whole note) or "section" (one heading section);
+    anchor/chain/line_start/line_end are only set on sections, the
+    frontmatter description only on files. title_cjk/body_cjk index the
+    same text with the "cjk" analyzer; code holds identifiers from fenced
+    code, or a .py/.yaml file's symbols (codeindex.py). words (file
+    documents only) is the unstemmed term list behind --suggest
+    (suggest.py). dir (directory facet), size and
+    modified are indexed fast fields, so filters run inside the query.
+
+    body is indexed but not stored: the text lives in the body store
+    (bodystore.py) under body_id and is read only for snippets. size,
+    line_start and line_end are fast fields, so a hit's doc-store fetch
+    is down to the short text fields.
+    """
+    builder = tantivy.SchemaBuilder()
+    builder.add_text_field("kind", tokenizer_name="raw")
+    builder.add_text_field("title", stored=True, tokenizer_name="en_stem")
+    builder.add_text_field("body", tokenizer_name="en_stem")
+    builder.add_text_field("title_cjk", tokenizer_name="cjk")
+    builder.add_text_field("body_cjk", tokenizer_name="cjk")
+    builder.add_text_field("code", tokenizer_name="code")
+    builder.add_text_field("description", stored=True, tokenizer_name="en_stem")
+    builder.add_text_field("words", tokenizer_name="words",
+                           index_option="basic")
+    builder.add_text_field("path", stored=True, tokenizer_name="raw")
+    builder.add_facet_field("dir")
+    builder.add_integer_field("size", stored=True, indexed=True, fast=True)
+    builder.add_date_field("modified", stored=True, indexed=True, fast=True)
+    builder.add_text_field("anchor", stored=True, tokenizer_name="raw")
+    builder.add_text_field("chain", stored=True, tokenizer_name="raw")
+    builder.add_integer_field("line_start", stored=True, fast=True)
+    builder.add_integer_field("line_end", stored=True, fast=True)
+    builder.add_integer_field("body_id", fast=True)
+    return builder.build()
+
+
+def register_analyzers(index):
+    """Register custom analyzers; tantivy does not persist them."""
+    analyzer = (
+        tantivy.TextAnalyzerBuilder(tantivy.Tokenizer.regex(CJK_TOKEN_PATTERN))
+        .filter(tantivy.Filter.lowercase())
+        .build()
+    )
+    index.register_tokenizer("cjk", analyzer)
+    for name, pattern in (("code", CODE_TOKEN_PATTERN),
+                          ("words", WORDS_TOKEN_PATTERN)):
+        index.register_tokenizer(name, (
+            tantivy.TextAnalyzerBuilder(tantivy.Tokenizer.regex(pattern))
+            .filter(tantivy.Filter.remove_long(40))
+            .filter(tantivy.Filter.lowercase())
+            .build()
+        ))
+    return index
+
+
+def make_document(fields, body_id):
+    """Build a tantivy document, mirroring title/body into the CJK fields.
+
+    File documents also get the words field (title, body and code).
+    Workers send the dir facet as a string (Facet objects don't pickle).
+    """
+    fields = dict(fields, body_id=body_id,
+                  dir=[tantivy.Facet.from_string(fields["dir"][0])])
+    if fields["kind"] == ["file"]:
+        fields["words"] = (fields["title"] + fields["body"]
+                           + fields.get("code", []))
+    return tantivy.Document(
+        title_cjk=fields["title"], body_cjk=fields["body"], **fields)
+
+
+def build_index(ai_dir, force=False, workers=None,
+                heap_size=WRITER_HEAP_SIZE, num_threads=WRITER_THREADS,
+                paths=None, fold_near=None, log=print, collect=None):
+    """Build or incrementally update the search index.
+
+    Only new, changed and removed files are touched; the manifest stored
+    in the index directory records what the last build saw. force=True
+    (or a missing/outdated index) builds a fresh generation aside and
+    swaps it in when done (publish.py), so searches never see a partial
+    index; builds are serialized by a writer lock. paths (root-relative posix
+    paths, e.g. from --watch) limits the update to those files instead
+    of walking the corpus; a path that no longer exists is deleted.
+
+    Preprocessing runs in `workers` processes (default: CPUs - 1) and
+    feeds the single tantivy writer, which gets `heap_size` bytes split
+    over `num_threads` indexing threads (0 = tantivy's choice).
+
+    Copies of a file are indexed once (dedup.py); fold_near > 0 also
+    folds near-duplicates. None keeps the index's current setting.
+    Progress and the report go to log (print; a no-op silences them).
+    collect, a dict, receives the files read in full (iter_prepared).
+    """
+    index_path = ai_dir / INDEX_DIR_NAME
+    with writer_lock(index_path):
+        manifest = load_manifest(index_path) if index_path.exists() else None
+        fold_near = fold_threshold(manifest, fold_near)
+        if not force and index_path.exists():
+            if manifest is None:
+                log("No manifest found — doing a full rebuild")
+                force = True
+            elif manifest.get("schema_version") != SCHEMA_VERSION:
+                log("Schema version changed — doing a full rebuild")
+                force = True
+            elif fold_near != fold_threshold(manifest):
+                log("Duplicate folding changed — doing a full rebuild")
+                force = True
+        if force:
+            manifest = None
+        if manifest is not None:
+            return _update(ai_dir, index_path, index_path, manifest, workers,
+                           heap_size, num_threads, paths, fold_near, log,
+                           collect)
+        target = new_generation(index_path)
+        try:
+            counts = _update(ai_dir, index_path, target, None, workers,
+                             heap_size, num_threads, None, fold_near, log,
+                             collect)
+        except BaseException:
+            discard(target)
+            raise
+        publish(index_path, target)
+        return counts
+
+
+def _update(ai_dir, index_path, target, manifest, workers, heap_size,
+            num_threads, paths, fold_near, log, collect):
+    """Apply the corpus changes to the index in `target`; returns counts.
+
+    target is index_path itself, or a new generation (manifest None)
+    that build_index publishes afterwards. Aliases of a changed or
+    removed canonical file are prepared again after the other jobs.
+    """
+    timings = {}
+    started = time.perf_counter()
+    schema = build_schema()
+    index = register_analyzers(tantivy.Index(schema, path=str(target)))
+
+    old_files = manifest["files"] if manifest else {}
+    if paths is not None and manifest is not None:
+        current = {
+            rel: ai_dir / rel for rel in paths
+            if is_indexed_path(rel) and (ai_dir / rel).is_file()
+        }
+        new, maybe_changed, removed, unchanged = plan_changes(
+            {rel: old_files[rel] for rel in paths if rel in old_files},
+            current)
+    else:
+        current = {
+            f.relative_to(ai_dir).as_posix(): f for f in collect_files(ai_dir)
+        }
+        new, maybe_changed, removed, unchanged = plan_changes(
+            old_files, current)
+    timings["scan"] = time.perf_counter() - started
+
+    files = dict(old_files)
+    counts = {"added": 0, "updated": 0, "deleted": 0,
+              "skipped": len(unchanged), "errors": 0}
+    writer = index.writer(heap_size=heap_size, num_threads=num_threads)
+    # tantivy-py < 0.25 only has the (now deprecated) delete_documents
+    delete_path = getattr(writer, "delete_documents_by_term",
+                          None) or writer.delete_documents
+
+    store = BodyStore(target)
+
+    for rel_path in removed:
+        delete_path("path", rel_path)
+        store.delete_path(rel_path)
+        del files[rel_path]
+        counts["deleted"] += 1
+
+    deduper = Deduper(old_files, fold_near)
+    orphans = [rel for rel in deduper.release(old_files, removed + maybe_changed)
+               if rel not in removed and (ai_dir / rel).is_file()]
+    jobs = [
+        (rel_path, str(current[rel_path]),
+         old_files.get(rel_path, {}).get("hash"))
+        for rel_path in maybe_changed + new if rel_path not in orphans
+    ] + [(rel, str(ai_dir / rel), None) for rel in orphans]
+    timings["add"] = 0.0
+    loop_start = time.perf_counter()
+    for prepared in iter_prepared(jobs, workers, collect):
+        rel_path = prepared["rel_path"]
+        if "error" in prepared:
+            counts["errors"] += 1
+            log(f"  WARN: {rel_path}: {prepared['error']}")
+            continue
+        if prepared.get("unchanged"):
+            files[rel_path] = dict(old_files[rel_path], **prepared["entry"])
+            if "alias_of" not in files[rel_path]:
+                deduper.keep(rel_path, files[rel_path])
+            counts["skipped"] += 1
+            continue
+        entry = files[rel_path] = prepared["entry"]
+        if fold_near:
+            entry["sketch"] = prepared["sketch"]
+        canonical = deduper.canonical_for(rel_path, entry)
+        add_start = time.perf_counter()
+        if rel_path in old_files:
+            # Removes the file document and all its section documents
+            delete_path("path", rel_path)
+            store.delete_path(rel_path)
+        if canonical is not None:
+            entry["alias_of"] = canonical
+            timings["add"] += time.perf_counter() - add_start
+            if rel_path not in orphans:
+                counts["updated" if rel_path in old_files else "added"] += 1
+            continue
+        fields = dict(prepared["fields"])
+        outline = fields.pop("outline")[0]
+        docs = [fields, *prepared["sections"]]
+        body_ids = store.add_file(rel_path, [f["body"][0] for f in docs],
+                                  outline)
+        for fields, body_id in zip(docs, body_ids):
+            writer.add_document(make_document(fields, body_id))
+        timings["add"] += time.perf_counter() - add_start
+        if rel_path not in orphans:
+            counts["updated" if rel_path in old_files else "added"] += 1
+    # Time spent waiting on workers, i.e. not hidden behind the writer
+    timings["preprocess"] = time.perf_counter() - loop_start - timings["add"]
+
+    commit_start = time.perf_counter()
+    groups = alias_groups(files)
+    changed = counts["added"] + counts["updated"] + counts["deleted"]
+    if changed or manifest is None or groups != alias_groups(old_files):
+        store.set_aliases(groups)
+        writer.commit()
+        store.commit()
+        writer.wait_merging_threads()
+        last_commit = datetime.now().isoformat(timespec="seconds")
+    else:
+        writer.rollback()
+        store.rollback()
+        last_commit = manifest.get("last_commit")
+    timings["commit"] = time.perf_counter() - commit_start
+    store.close()
+
+    save_manifest(target, {
+        "schema_version": SCHEMA_VERSION,
+        "last_commit": last_commit,
+        "fold_near": fold_near,
+        "files": files,
+    })
+
+    verb = "built" if not old_files else "updated"
+    log(f"Index {verb}: {counts['added']} added, {counts['updated']} updated, "
+        f"{counts['deleted']} deleted, {counts['skipped']} skipped, "
+        f"{counts['errors']} errors")
+    log("Timings: " + " | ".join(
+        f"{stage} {timings[stage]:.2f}s"
+        for stage in ("scan", "preprocess", "add", "commit")))
+    dedup_note = summary(files)
+    if dedup_note:
+        log(dedup_note)
+    log(f"Location: {index_path}")
+    return counts
+
+
+class OpenIndex:
+    """A tantivy Index plus its body store.
+
+    Behaves like the Index it wraps. body_store() opens the store on
+    first use, once per thread (sqlite connections stay on the thread
+    that made them; the warm server answers from several).
+    """
+
+    def __init__(self, index, index_path):
+        self.index = index
+        self.index_path = index_path
+        self._local = threading.local()
+
+    def __getattr__(self, name):
+        return getattr(self.index, name)
+
+    def body_store(self):
+        store = getattr(self._local, "store", None)
+        if store is None:
+            store = self._local.store = BodyStore(self.index_path)
+        return store
+
+
+def open_index(index_path):
+    """Open an existing index directory for searching.
+
+    The path is resolved first, so the index and its body store stay on
+    the same generation when a rebuild swaps the symlink.
+    """
+    index_path = index_path.resolve()
+    index = register_analyzers(tantivy.Index(build_schema(), path=str(index_path)))
+    index.reload()
+    return OpenIndex(index, index_path)
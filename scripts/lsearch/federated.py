@@ -0,0 +1,73 @@
+"""federated.py — one query over several _ai_evolution roots.
+
+Standard library only. Each root is searched on its own thread through
+the usual single-root path (query cache, warm server, in-process index),
+so the wait is about the slowest root, not the sum of all of them.
+
+BM25 scores from different indexes aren't comparable (each has its own
+document count and term statistics), so every root's scores are divided
+by that root's best score before merging: each root's top hit scores
+1.0, the rest relative to it. The raw score stays in "raw_score" and
+"root" names the root a hit came from.
+
+A root must look like one (named _ai_evolution, holding a ROOT_MARKERS
+file, or already indexed): searching a root with no index builds one,
+which must not happen in an arbitrary directory.
+"""
+
+import pathlib
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_NAME = "_ai_evolution"
+INDEX_PREFIX = ".search_index"
+INDEX_DIRS = (".search_index", ".search_index_np")
+ROOT_MARKERS = ("project_context.md",)
+
+
+def resolve_root(path):
+    """_ai_evolution dir for a root, its project dir or an index dir."""
+    path = pathlib.Path(path).expanduser().resolve()
+    if path.name.startswith(INDEX_PREFIX):
+        path = path.parent
+    elif path.name != ROOT_NAME and (path / ROOT_NAME).is_dir():
+        path = path / ROOT_NAME
+    if not path.is_dir():
+        raise ValueError(f"not a directory: {path}")
+    if not (path.name == ROOT_NAME
+            or any((path / name).exists() for name in INDEX_DIRS)
+            or any((path / name).is_file() for name in ROOT_MARKERS)):
+        raise ValueError(f"not an _ai_evolution root (no index, no "
+                         f"{' or '.join(ROOT_MARKERS)}): {path}")
+    return path
+
+
+def resolve_roots(paths):
+    """Resolved, deduplicated roots in the order given."""
+    return list(dict.fromkeys(resolve_root(p) for p in paths))
+
+
+def root_labels(roots):
+    """Short label per root: the project directory name, else the path."""
+    names = [r.parent.name if r.name == ROOT_NAME else r.name for r in roots]
+    return {
+        root: name if names.count(name) == 1 else str(root)
+        for root, name in zip(roots, names)
+    }
+
+
+def search_roots(roots, search, top_k=5):
+    """Merged top_k of search(root) -> [result, ...] over all roots.
+
+    A root whose search returns None (and printed why) is skipped.
+    """
+    labels = root_labels(roots)
+    merged = []
+    with ThreadPoolExecutor(max_workers=max(1, len(roots))) as pool:
+        for root, results in zip(roots, pool.map(search, roots)):
+            best = max((r["score"] for r in results or []), default=0.0)
+            for r in results or []:
+                merged.append(dict(
+                    r, root=labels[root], raw_score=r["score"],
+                    score=r["score"] / best if best > 0 else 0.0))
+    merged.sort(key=lambda r: (-r["score"], -r["raw_score"]))
+    return merged[:top_k]
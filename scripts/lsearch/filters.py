@@ -0,0 +1,78 @@
+"""filters.py — parse --dir/--since/--until/--recent/--boost values.
+
+Standard library only. Filter values travel as plain strings (through
+the server socket and into cache keys) and are turned into datetimes
+and directory prefixes here, right before a backend builds its query.
+"""
+
+import datetime
+import re
+
+# (age in days, share of --recent weight). The windows stack: a note
+# from this week collects all three, one from two months ago only the last.
+RECENCY_TIERS = ((7, 1.0), (30, 0.5), (90, 0.25))
+
+_RELATIVE = re.compile(r"^(\d+)([dw])$")
+
+
+def parse_when(value, end=False):
+    """Aware UTC datetime for "YYYY-MM-DD", an ISO timestamp, or "7d"/"2w".
+
+    Plain dates are local days; end=True moves them to the end of that
+    day, so --until 2026-02-13 includes notes edited on the 13th.
+    """
+    value = value.strip()
+    match = _RELATIVE.match(value)
+    if match:
+        days = int(match.group(1)) * (7 if match.group(2) == "w" else 1)
+        return now_utc() - datetime.timedelta(days=days)
+    try:
+        when = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"bad date {value!r}: use YYYY-MM-DD, an ISO "
+                         f"timestamp, or Nd / Nw") from None
+    if end and len(value) == 10:
+        when += datetime.timedelta(days=1) - datetime.timedelta(microseconds=1)
+    if when.tzinfo is None:
+        when = when.astimezone()  # local time
+    return when.astimezone(datetime.timezone.utc)
+
+
+def is_relative(value):
+    """True for "7d"/"2w" style values, which move with the clock."""
+    return bool(value) and bool(_RELATIVE.match(value.strip()))
+
+
+def now_utc():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def normalize_dir(value):
+    """"session_notes/" or "./session_notes" -> "session_notes"."""
+    parts = [p for p in value.replace("\\", "/").split("/") if p not in ("", ".")]
+    if not parts:
+        raise ValueError("--dir needs a directory (root files have none)")
+    return "/".join(parts)
+
+
+def dir_facet(rel_path):
+    """Facet path of a file's directory: "/session_notes/projects", or "/"."""
+    parent = rel_path.rsplit("/", 1)[0] if "/" in rel_path else ""
+    return "/" + parent
+
+
+def parse_boost(value):
+    """--boost "title=5" -> ("title", 5.0); the field is checked later."""
+    field, sep, weight = value.partition("=")
+    if not sep:
+        raise ValueError(f"bad boost {value!r}: use FIELD=WEIGHT")
+    return field.strip(), float(weight)
+
+
+def recency_windows(weight):
+    """[(start datetime, boost)] for a --recent weight; empty if 0."""
+    if not weight:
+        return []
+    now = now_utc()
+    return [(now - datetime.timedelta(days=days), weight * share)
+            for days, share in RECENCY_TIERS]
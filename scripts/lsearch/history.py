@@ -0,0 +1,339 @@
+"""history.py — optional search index over the git history of the notes.
+
+Every version of every indexed note that git has seen, keyed by blob
+SHA: identical content (a revert, a copy, a file that didn't change
+across a rename) is one tantivy document, indexed once. The index lives
+in .search_index_history/:
+
+    tantivy files   one document per blob: title, body, first path,
+                    first commit and its date (first_seen, a fast field)
+    versions.sqlite which blob each path held over which time span
+                    (start, end) and the last indexed commit
+
+Updates read `git log --raw` for the commits after the last indexed one
+(first-parent, so merges count once) and fetch only blobs not seen
+before through one `git cat-file --batch` process. A rewritten history
+(last commit no longer an ancestor of HEAD) triggers a full rebuild,
+which fills a new generation directory and swaps it in (publish.py);
+builds hold the writer lock, as for the main index.
+
+Queries:
+    plain        every matching blob, best first
+    as_of=WHEN   only versions that were current at WHEN, shown under
+                 the path they had then
+    first_seen   matching blobs in order of first appearance
+"""
+
+import datetime
+import sqlite3
+import subprocess
+import sys
+import time
+
+from lsearch.corpus import (
+    HISTORY_DIR_NAME, INDEX_EXTENSIONS, is_indexed_path, scan_markdown,
+)
+from lsearch.engine import register_analyzers, tantivy
+from lsearch.filters import parse_when
+from lsearch.planner import field_boosts, plan
+from lsearch.publish import discard, new_generation, publish, writer_lock
+
+HISTORY_VERSION = 1
+VERSIONS_NAME = "versions.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+    path TEXT NOT NULL, blob TEXT NOT NULL, commit_sha TEXT NOT NULL,
+    start INTEGER NOT NULL, end INTEGER);
+CREATE INDEX IF NOT EXISTS versions_blob ON versions (blob);
+CREATE INDEX IF NOT EXISTS versions_open ON versions (path, end);
+CREATE TABLE IF NOT EXISTS blobs (blob TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def build_schema():
+    builder = tantivy.SchemaBuilder()
+    builder.add_text_field("blob", stored=True, tokenizer_name="raw")
+    builder.add_text_field("title", stored=True, tokenizer_name="en_stem")
+    builder.add_text_field("body", tokenizer_name="en_stem")
+    builder.add_text_field("title_cjk", tokenizer_name="cjk")
+    builder.add_text_field("body_cjk", tokenizer_name="cjk")
+    builder.add_text_field("path", stored=True, tokenizer_name="raw")
+    builder.add_text_field("commit", stored=True, tokenizer_name="raw")
+    builder.add_date_field("first_seen", stored=True, indexed=True, fast=True)
+    return builder.build()
+
+
+# --- Git ---
+
+def _git(ai_dir, *args):
+    """Raw stdout of a git command run in ai_dir; raises ValueError on
+    failure."""
+    try:
+        done = subprocess.run(["git", "-C", str(ai_dir), *args],
+                              capture_output=True, check=True)
+    except FileNotFoundError:
+        raise ValueError("git is not installed") from None
+    except subprocess.CalledProcessError as e:
+        raise ValueError(e.stderr.decode("utf-8", "replace").strip()) from None
+    return done.stdout
+
+
+def iter_changes(ai_dir, since=None):
+    """Yield (commit, unix time, [(status, path, blob), ...]) oldest first.
+
+    Paths are relative to ai_dir; only indexed notes (markdown, not the
+    code files) are reported.
+    Renames come out as a delete plus an add. The log is read with -z so
+    paths arrive unquoted (git quotes non-ASCII names otherwise); a path
+    that isn't UTF-8 is skipped with a warning.
+    """
+    revs = f"{since}..HEAD" if since else "HEAD"
+    out = _git(ai_dir, "log", "-z", "--reverse", "--first-parent",
+               "--no-renames", "--raw", "--no-abbrev", "--relative",
+               "--format=%x01%H %ct", revs, "--", ".")
+    commit = None
+    fields = iter(out.split(b"\0"))
+    for field in fields:
+        field = field.lstrip(b"\n")
+        if field.startswith(b"\x01"):
+            if commit:
+                yield commit
+            sha, ct = field[1:].decode("ascii").split()
+            commit = (sha, int(ct), [])
+        elif field.startswith(b":") and commit:
+            meta, raw_path = field.decode("ascii").split(), next(fields, b"")
+            try:
+                path = raw_path.decode("utf-8")
+            except UnicodeDecodeError:
+                print(f"  WARN: skipping non-UTF-8 path {raw_path!r} "
+                      f"in {commit[0][:8]}")
+                continue
+            status, blob = meta[4][0], meta[3]
+            if (is_indexed_path(path)
+                    and path[path.rfind("."):].lower() in INDEX_EXTENSIONS):
+                commit[2].append((status, path, blob))
+    if commit:
+        yield commit
+
+
+class BlobReader:
+    """One `git cat-file --batch` process answering blob lookups."""
+
+    def __init__(self, ai_dir):
+        self._proc = subprocess.Popen(
+            ["git", "-C", str(ai_dir), "cat-file", "--batch"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def read(self, blob):
+        self._proc.stdin.write(blob.encode("ascii") + b"\n")
+        self._proc.stdin.flush()
+        header = self._proc.stdout.readline().split()
+        if len(header) < 3 or header[1] != b"blob":
+            return None
+        data = self._proc.stdout.read(int(header[2]) + 1)[:-1]
+        return data.decode("utf-8", "replace")
+
+    def close(self):
+        self._proc.stdin.close()
+        self._proc.wait()
+
+
+# --- Build ---
+
+def _open_store(index_path):
+    db = sqlite3.connect(str(index_path / VERSIONS_NAME))
+    db.executescript(_SCHEMA)
+    return db
+
+
+def _state(db, key):
+    row = db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def _is_ancestor(ai_dir, commit):
+    try:
+        _git(ai_dir, "merge-base", "--is-ancestor", commit, "HEAD")
+        return True
+    except ValueError:
+        return False
+
+
+def _utc(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc)
+
+
+def build_history(ai_dir, force=False):
+    """Index commits after the last indexed one; returns counts."""
+    sys.stdout.reconfigure(encoding="utf-8")
+    index_path = ai_dir / HISTORY_DIR_NAME
+    with writer_lock(index_path):
+        return _build(ai_dir, index_path, force)
+
+
+def _build(ai_dir, index_path, force):
+    started = time.perf_counter()
+    last = None
+    if index_path.exists() and not force:
+        db = _open_store(index_path)
+        last, version = _state(db, "last_commit"), _state(db, "version")
+        db.close()
+        if version != str(HISTORY_VERSION) or (
+                last and not _is_ancestor(ai_dir, last)):
+            print("History rewritten or format changed — full rebuild")
+            force, last = True, None
+    changes = list(iter_changes(ai_dir, last))
+    if force or not index_path.exists():
+        target = new_generation(index_path)
+        try:
+            counts = _add_changes(ai_dir, target, changes)
+        except BaseException:
+            discard(target)
+            raise
+        publish(index_path, target)
+    else:
+        counts = _add_changes(ai_dir, index_path, changes)
+    print(f"History index: {counts['commits']} commits, "
+          f"{counts['versions']} versions, {counts['blobs']} new blobs "
+          f"in {time.perf_counter() - started:.2f}s")
+    return counts
+
+
+def _add_changes(ai_dir, index_path, changes):
+    """Index changes into the generation at index_path; returns counts."""
+    index = register_analyzers(
+        tantivy.Index(build_schema(), path=str(index_path)))
+    db = _open_store(index_path)
+    writer = index.writer()
+    delete_blob = getattr(writer, "delete_documents_by_term",
+                          None) or writer.delete_documents
+    reader = BlobReader(ai_dir)
+    counts = {"commits": len(changes), "versions": 0, "blobs": 0}
+    try:
+        for sha, ct, files in changes:
+            for status, path, blob in files:
+                db.execute("UPDATE versions SET end = ? "
+                           "WHERE path = ? AND end IS NULL", (ct, path))
+                if status == "D":
+                    continue
+                db.execute("INSERT INTO versions VALUES (?, ?, ?, ?, NULL)",
+                           (path, blob, sha, ct))
+                counts["versions"] += 1
+                if db.execute("SELECT 1 FROM blobs WHERE blob = ?",
+                              (blob,)).fetchone():
+                    continue
+                text = reader.read(blob)
+                if text is None:
+                    continue
+                scanned = scan_markdown(text)
+                # Drop a copy left by an interrupted build before re-adding
+                delete_blob("blob", blob)
+                writer.add_document(tantivy.Document(
+                    blob=[blob], title=[scanned.title], body=[scanned.body],
+                    title_cjk=[scanned.title], body_cjk=[scanned.body],
+                    path=[path], commit=[sha], first_seen=_utc(ct)))
+                db.execute("INSERT INTO blobs VALUES (?)", (blob,))
+                counts["blobs"] += 1
+    finally:
+        reader.close()
+    writer.commit()
+    writer.wait_merging_threads()
+    if changes:
+        db.execute("INSERT OR REPLACE INTO state VALUES ('last_commit', ?)",
+                   (changes[-1][0],))
+    db.execute("INSERT OR REPLACE INTO state VALUES ('version', ?)",
+               (str(HISTORY_VERSION),))
+    db.commit()
+    db.close()
+    return counts
+
+
+# --- Query ---
+
+def open_history(ai_dir):
+    """(index, versions db) for searching, or None if never built."""
+    # Resolved first so the index and the db come from one generation
+    index_path = (ai_dir / HISTORY_DIR_NAME).resolve()
+    if not (index_path / VERSIONS_NAME).exists():
+        return None
+    index = register_analyzers(
+        tantivy.Index(build_schema(), path=str(index_path)))
+    index.reload()
+    return index, _open_store(index_path)
+
+
+def _live_version(db, blob, when):
+    """(path, commit, start) of a version of blob current at `when`."""
+    return db.execute(
+        "SELECT path, commit_sha, start FROM versions WHERE blob = ? "
+        "AND start <= ? AND (end IS NULL OR end > ?) ORDER BY start DESC",
+        (blob, when, when)).fetchone()
+
+
+def search_history(ai_dir, query_str, top_k=5, as_of=None, first_seen=False):
+    """Result dicts (score, title, path, blob, commit, date), or None.
+
+    as_of ("2026-02-01", "3w") keeps versions current at that time and
+    reports their path and commit then; first_seen orders by first
+    appearance (score is then None).
+    """
+    opened = open_history(ai_dir)
+    if opened is None:
+        return None
+    index, db = opened
+    searcher = index.searcher()
+    fields = ["title", "body", "title_cjk", "body_cjk"]
+    when = parse_when(as_of, end=True) if as_of else None
+    clauses = []
+    if when:
+        clauses.append((tantivy.Occur.Must, tantivy.Query.range_query(
+            index.schema, "first_seen", tantivy.FieldType.Date,
+            _utc(0), when)))
+
+    results = []
+    for stage, text_query in plan(index, query_str, fields,
+                                  field_boosts(fields)):
+        query = tantivy.Query.boolean_query(
+            [(tantivy.Occur.Must, text_query)] + clauses)
+        limit = top_k * 4 if when else top_k
+        while True:
+            if first_seen:
+                hits = searcher.search(query, limit, order_by_field="first_seen",
+                                       order=tantivy.Order.Asc).hits
+            else:
+                hits = searcher.search(query, limit).hits
+            results = _shape(searcher, db, hits, when, first_seen, stage)
+            if len(results) >= top_k or len(hits) < limit:
+                break
+            limit *= 4
+        if results:
+            break
+    db.close()
+    return results[:top_k]
+
+
+def _shape(searcher, db, hits, when, first_seen, stage):
+    results = []
+    for key, address in hits:
+        doc = searcher.doc(address)
+        blob = doc["blob"][0]
+        path, commit, date = doc["path"][0], doc["commit"][0], \
+            doc["first_seen"][0]
+        if when:
+            live = _live_version(db, blob, when.timestamp())
+            if live is None:
+                continue
+            path, commit, start = live
+            date = _utc(start)
+        results.append({
+            "score": None if first_seen else key,
+            "title": doc["title"][0],
+            "path": path,
+            "blob": blob,
+            "commit": commit,
+            "date": date.isoformat(timespec="seconds"),
+            "stage": stage,
+        })
+    return results
@@ -0,0 +1,88 @@
+"""manifest.py — per-file fingerprints for incremental re-indexing.
+
+The manifest lives inside the index directory as manifest.json:
+
+    {
+      "schema_version": 11,
+      "last_commit": "2026-02-13T02:30:00",
+      "fold_near": 0.0,
+      "files": {"workflows/session_end.md": {"size": .., "mtime": ..,
+                                              "hash": .., "norm": ..}}
+    }
+
+schema_version is engine.SCHEMA_VERSION (npbm25.FORMAT_VERSION for the
+numpy index); "norm", "alias_of" and "fold_near" are dedup.py's.
+
+A build compares it against the files on disk and only touches documents
+whose path is new, changed or gone. size+mtime is the cheap check; the
+content hash decides when they differ (e.g. after a fresh git checkout).
+"""
+
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = "manifest.json"
+
+
+def content_hash(data):
+    """Hash raw file bytes (sha1 is plenty for change detection)."""
+    return hashlib.sha1(data).hexdigest()
+
+
+def fingerprint(stat, data):
+    """Build a manifest entry from an os.stat result and the file bytes."""
+    return {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "hash": content_hash(data),
+    }
+
+
+def load_manifest(index_path):
+    """Load the manifest, or None if missing/unreadable."""
+    path = index_path / MANIFEST_NAME
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if not isinstance(manifest.get("files"), dict):
+        return None
+    return manifest
+
+
+def save_manifest(index_path, manifest):
+    """Write the manifest atomically (tmp file + os.replace)."""
+    path = index_path / MANIFEST_NAME
+    tmp = path.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def plan_changes(old_files, current):
+    """Split the corpus into work buckets.
+
+    Args:
+        old_files: manifest "files" dict from the previous build.
+        current: {rel_path: pathlib.Path} for files on disk now.
+
+    Returns:
+        (new, maybe_changed, removed, unchanged) — lists of rel paths.
+        maybe_changed entries differ in size or mtime; the caller hashes
+        them to decide between "updated" and "skipped".
+    """
+    new, maybe_changed, unchanged = [], [], []
+    for rel, fpath in current.items():
+        entry = old_files.get(rel)
+        if entry is None:
+            new.append(rel)
+            continue
+        stat = fpath.stat()
+        if stat.st_size == entry.get("size") and stat.st_mtime == entry.get("mtime"):
+            unchanged.append(rel)
+        else:
+            maybe_changed.append(rel)
+    removed = [rel for rel in old_files if rel not in current]
+    return new, maybe_changed, removed, unchanged
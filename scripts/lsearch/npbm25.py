@@ -0,0 +1,266 @@
+"""npbm25.py — dependency-light BM25 backend on NumPy arrays.
+
+Fallback for machines without tantivy (--backend numpy, or automatic when
+tantivy can't be imported). Same documents as the tantivy index (file +
+section docs from pipeline.prepare_file), stored as flat arrays in
+.search_index_np/ and opened with np.load(mmap_mode="r"), so opening is
+a handful of mmaps plus one small JSON file:
+
+    terms.npy      sorted vocabulary (fixed-width unicode); term id = row
+    idf.npy        BM25 idf per term
+    post_ptr.npy   CSR row pointers: postings of term t are [ptr[t], ptr[t+1])
+    post_doc.npy   doc ids, grouped by term
+    post_tf.npy    term frequency (title counts TITLE_WEIGHT times)
+    doc_len.npy, kind.npy, path_id.npy, modified.npy   per-doc columns
+    body_ptr.npy + bodies.bin            stripped bodies, read only for snippets
+    docs.json      paths, per-doc display fields (title, anchor, ...)
+                   and the groups of folded copies (dedup.alias_groups)
+    outlines.json  the outline of each file (outline.py), read only for
+                   --outline / --with-outline
+
+Tokens: lowercase words; CJK runs become overlapping bigrams. No stemming
+and no query language — a query is a bag of words, scored with BM25.
+Any change to the corpus rebuilds the arrays (cheap at this scale; see
+npbuild.py).
+"""
+
+import json
+import re
+import sys
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:
+    print("ERROR: numpy not installed. Run: pip install numpy")
+    sys.exit(1)
+
+from lsearch.corpus import CJK_CLASS, NP_INDEX_DIR_NAME, collapse_snippet
+from lsearch.dedup import (
+    attach_aliases, manifest_counts, matching_copies, relocate,
+)
+from lsearch.filters import normalize_dir, parse_when, recency_windows
+from lsearch.manifest import load_manifest
+
+INDEX_DIR_NAME = NP_INDEX_DIR_NAME
+FORMAT_VERSION = 8
+
+K1 = 1.2
+B = 0.75
+TITLE_WEIGHT = 2
+MAX_TERM_LEN = 32
+
+_TOKEN = re.compile(rf"({CJK_CLASS}+)|((?:(?!{CJK_CLASS})[^\W_])+)")
+KINDS = ("file", "section")
+
+
+def tokenize(text):
+    """Lowercase word tokens; CJK runs become overlapping bigrams."""
+    tokens = []
+    for cjk, word in _TOKEN.findall(text.lower()):
+        if word:
+            if len(word) <= MAX_TERM_LEN:
+                tokens.append(word)
+        elif len(cjk) == 1:
+            tokens.append(cjk)
+        else:
+            tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+    return tokens
+
+
+# --- Query ---
+
+class NpIndex:
+    """Memory-mapped view of a built array index."""
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self.reload()
+
+    def reload(self):
+        path = self.index_path
+        for name in ("terms", "idf", "post_ptr", "post_doc", "post_tf",
+                     "doc_len", "kind", "path_id", "modified", "body_ptr",
+                     "file_df"):
+            setattr(self, name, np.load(path / f"{name}.npy", mmap_mode="r"))
+        with open(path / "docs.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.paths, self.docs = meta["paths"], meta["docs"]
+        self.groups = meta["groups"]
+        self.aliases = {canonical: [rel for rel, _ in members[1:]]
+                        for canonical, members in self.groups.items()}
+        self.avg_len = float(self.doc_len.mean()) if len(self.doc_len) else 1.0
+        self._bodies = None
+        self._outlines = None
+
+    def term_id(self, token):
+        i = int(np.searchsorted(self.terms, token))
+        if i < len(self.terms) and self.terms[i] == token:
+            return i
+        return None
+
+    def body(self, doc_id):
+        if self._bodies is None:
+            self._bodies = np.memmap(self.index_path / "bodies.bin",
+                                     dtype=np.uint8, mode="r")
+        start, end = self.body_ptr[doc_id], self.body_ptr[doc_id + 1]
+        return bytes(self._bodies[start:end]).decode("utf-8")
+
+    def outline(self, path):
+        if self._outlines is None:
+            with open(self.index_path / "outlines.json", "r",
+                      encoding="utf-8") as f:
+                self._outlines = json.load(f)
+        return self._outlines.get(path)
+
+
+def open_index(index_path):
+    # Resolved, so reload() stays on this generation after a swap
+    return NpIndex(index_path.resolve())
+
+
+def _scores(index, tokens):
+    scores = np.zeros(len(index.doc_len), dtype=np.float32)
+    for token in set(tokens):
+        tid = index.term_id(token)
+        if tid is None:
+            continue
+        start, end = index.post_ptr[tid], index.post_ptr[tid + 1]
+        docs = index.post_doc[start:end]
+        tf = index.post_tf[start:end]
+        norm = K1 * (1 - B + B * index.doc_len[docs] / index.avg_len)
+        # doc ids are unique within one term's postings, so += is safe
+        scores[docs] += index.idf[tid] * tf * (K1 + 1) / (tf + norm)
+    return scores
+
+
+def _snippet(body, tokens, budget):
+    """Window around the first query-term hit, with highlight spans."""
+    wanted = set(tokens)
+    spans = []
+    for match in _TOKEN.finditer(body.lower()):
+        cjk, word = match.groups()
+        if word and word in wanted:
+            spans.append([match.start(), match.end()])
+        elif cjk:
+            spans.extend([match.start() + i, match.start() + i + 2]
+                         for i in range(len(cjk)) if cjk[i:i + 2] in wanted)
+    start = max(0, spans[0][0] - budget // 4) if spans else 0
+    end = start + budget
+    merged = []
+    for s, e in spans:
+        if s < start or e > end:
+            continue
+        if merged and s <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], e)
+        else:
+            merged.append([s, e])
+    return collapse_snippet(body[start:end],
+                            [[s - start, e - start] for s, e in merged])
+
+
+def _filter_mask(index, dirs, since, until, copies=()):
+    """Boolean mask of docs passing the dir/date filters, plus the docs of
+    the canonical files in copies (dedup.matching_copies)."""
+    mask = np.ones(len(index.docs), dtype=bool)
+    if dirs:
+        prefixes = tuple(normalize_dir(d) + "/" for d in dirs)
+        allowed = [i for i, p in enumerate(index.paths)
+                   if p.startswith(prefixes)]
+        mask &= np.isin(index.path_id, allowed)
+    if since:
+        mask &= index.modified >= parse_when(since).timestamp()
+    if until:
+        mask &= index.modified <= parse_when(until, end=True).timestamp()
+    if copies:
+        mask |= np.isin(index.path_id, [i for i, p in enumerate(index.paths)
+                                        if p in copies])
+    return mask
+
+
+def run_query(index, query_str, top_k=5, sections=False, collapse=False,
+              snippet_chars=0, dirs=None, since=None, until=None, recent=0.0,
+              outline=False, **unsupported):
+    """BM25 over the arrays; same result dicts as query.run_query."""
+    if unsupported:
+        raise ValueError("numpy backend does not support: "
+                         + ", ".join(sorted(unsupported)))
+    tokens = tokenize(query_str)
+    scores = _scores(index, tokens)
+    matched = scores > 0
+    for start, boost in recency_windows(recent):
+        scores[matched & (index.modified >= start.timestamp())] += boost
+    scores[index.kind != KINDS.index("section" if sections else "file")] = 0
+    copies = matching_copies(index.groups, dirs, since, until) if (
+        dirs or since or until) else {}
+    scores[~_filter_mask(index, dirs, since, until, copies)] = 0
+    candidates = np.flatnonzero(scores > 0)
+    candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+    results, seen_paths = [], set()
+    for doc_id in candidates:
+        if sections and collapse:
+            path_id = int(index.path_id[doc_id])
+            if path_id in seen_paths:
+                continue
+            seen_paths.add(path_id)
+        title, path, anchor, chain, line_start, line_end, size, \
+            description = index.docs[doc_id]
+        result = {"score": float(scores[doc_id]), "title": title,
+                  "path": path, "size": size, "stage": "exact"}
+        if description:
+            result["description"] = description
+        if sections:
+            result["anchor"] = anchor
+            result["heading"] = chain
+            result["lines"] = [line_start, line_end]
+        if snippet_chars > 0:
+            result["snippet"], result["highlights"] = _snippet(
+                index.body(int(doc_id)), tokens, snippet_chars)
+        if outline:
+            result["outline"] = index.outline(path)
+        results.append(result)
+        if len(results) == top_k:
+            break
+    return relocate(attach_aliases(results, index.aliases), copies)
+
+
+def file_outline(index, rel_path):
+    canonical = next((c for c, aliases in index.aliases.items()
+                      if rel_path in aliases), rel_path)
+    return index.outline(canonical)
+
+
+# --- Stats ---
+
+def index_stats(index_path):
+    """Same keys as stats.index_stats; the arrays are always one 'segment'."""
+    index = open_index(index_path)
+    section_docs = int(np.count_nonzero(index.kind == KINDS.index("section")))
+    manifest = load_manifest(index_path) or {"files": {}}
+    by_dir = Counter(
+        rel.split("/", 1)[0] if "/" in rel else "." for rel in manifest["files"]
+    )
+    index_size = sum(
+        entry.stat().st_size for entry in index_path.iterdir()
+        if entry.is_file()
+    )
+    num_docs = len(index.docs)
+    return {
+        "num_docs": num_docs,
+        "file_docs": num_docs - section_docs,
+        "section_docs": section_docs,
+        **manifest_counts(manifest["files"]),
+        "by_dir": dict(sorted(by_dir.items())),
+        "last_commit": manifest.get("last_commit"),
+        "index_size": index_size,
+        "segments": 1, "max_doc": num_docs, "deleted": 0,
+        "deleted_ratio": 0.0, "opstamp": None,
+        "terms": len(index.terms),
+    }
+
+
+def compact_index(ai_dir, index_path):
+    """Nothing to merge: every build writes the arrays from scratch."""
+    info = {"segments": 1, "deleted": 0, "deleted_ratio": 0.0}
+    return info, info
@@ -0,0 +1,185 @@
+"""npbuild.py — build the NumPy backend's arrays (layout in npbm25.py).
+
+Every build prepares the whole corpus through the shared pipeline and
+writes the arrays into a new generation directory, published atomically
+under the writer lock (publish.py). A build where nothing changed, or
+only mtimes moved, keeps the current arrays. Copies of a file
+(dedup.py) get no documents; docs.json keeps their "groups"
+(dedup.alias_groups).
+"""
+
+import json
+import time
+from collections import Counter
+
+import numpy as np
+
+from lsearch.corpus import collect_files
+from lsearch.dedup import Deduper, alias_groups, fold_threshold, summary
+from lsearch.manifest import load_manifest, plan_changes, save_manifest
+from lsearch.npbm25 import (
+    FORMAT_VERSION, INDEX_DIR_NAME, KINDS, TITLE_WEIGHT, tokenize,
+)
+from lsearch.pipeline import iter_prepared
+from lsearch.publish import discard, new_generation, publish, writer_lock
+
+
+def _write_arrays(index_path, docs, groups):
+    """Tokenize docs and write the array files."""
+    postings = []  # (term, doc id, tf)
+    doc_len = np.zeros(len(docs), dtype=np.float32)
+    for doc_id, fields in enumerate(docs):
+        counts = Counter(tokenize(fields["body"][0]))
+        counts.update(tokenize(fields.get("description", [""])[0]))
+        counts.update(tokenize(fields.get("code", [""])[0]))
+        for token in tokenize(fields["title"][0]):
+            counts[token] += TITLE_WEIGHT
+        doc_len[doc_id] = sum(counts.values())
+        postings.extend((t, doc_id, tf) for t, tf in counts.items())
+
+    terms = sorted({t for t, _, _ in postings})
+    term_id = {t: i for i, t in enumerate(terms)}
+    post_term = np.array([term_id[t] for t, _, _ in postings], dtype=np.int64)
+    order = np.argsort(post_term, kind="stable")
+    post_doc = np.array([d for _, d, _ in postings], dtype=np.int32)
+    post_tf = np.array([tf for _, _, tf in postings], dtype=np.float32)[order]
+    kind = np.array([KINDS.index(f["kind"][0]) for f in docs], dtype=np.uint8)
+    # Notes containing each term, for --suggest (sections not counted)
+    file_df = np.bincount(post_term[kind[post_doc] == 0],
+                          minlength=len(terms)).astype(np.int32)
+    post_doc = post_doc[order]
+    df = np.bincount(post_term, minlength=len(terms))
+    post_ptr = np.concatenate([[0], np.cumsum(df)]).astype(np.int64)
+    n = max(len(docs), 1)
+    idf = np.log(1 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+    paths = sorted({f["path"][0] for f in docs})
+    path_index = {p: i for i, p in enumerate(paths)}
+    bodies = [f["body"][0].encode("utf-8") for f in docs]
+    body_ptr = np.concatenate([[0], np.cumsum([len(b) for b in bodies])])
+
+    arrays = {
+        "terms": np.array(terms, dtype=f"<U{max(map(len, terms), default=1)}"),
+        "idf": idf, "post_ptr": post_ptr, "post_doc": post_doc,
+        "post_tf": post_tf, "doc_len": doc_len,
+        "kind": kind, "file_df": file_df,
+        "path_id": np.array([path_index[f["path"][0]] for f in docs],
+                            dtype=np.int32),
+        "modified": np.array([f["modified"].timestamp() for f in docs],
+                             dtype=np.float64),
+        "body_ptr": body_ptr.astype(np.int64),
+    }
+    for name, array in arrays.items():
+        np.save(index_path / f"{name}.npy", array)
+    (index_path / "bodies.bin").write_bytes(b"".join(bodies))
+    meta = [
+        [f["title"][0], f["path"][0], f.get("anchor", [""])[0],
+         f.get("chain", [""])[0], f.get("line_start", 0), f.get("line_end", 0),
+         f["size"], f.get("description", [""])[0]]
+        for f in docs
+    ]
+    outlines = {f["path"][0]: json.loads(f["outline"][0])
+                for f in docs if "outline" in f}
+    with open(index_path / "docs.json", "w", encoding="utf-8") as f:
+        json.dump({"paths": paths, "docs": meta, "groups": groups}, f,
+                  ensure_ascii=False)
+    with open(index_path / "outlines.json", "w", encoding="utf-8") as f:
+        json.dump(outlines, f, ensure_ascii=False)
+    return len(terms)
+
+
+def build_index(ai_dir, force=False, workers=None, paths=None,
+                fold_near=None, log=print, collect=None,
+                **_writer_options):
+    """Build the array index; skipped entirely when nothing changed.
+
+    paths is accepted for --watch but not used to narrow the work: the
+    arrays are rewritten from the whole corpus whenever anything changed,
+    into a new generation that replaces the old one atomically
+    (publish.py), under the same writer lock as the tantivy build.
+    fold_near, log and collect as in engine.build_index.
+    """
+    index_path = ai_dir / INDEX_DIR_NAME
+    with writer_lock(index_path):
+        return _build(ai_dir, index_path, force, workers, fold_near, log,
+                      collect)
+
+
+def _build(ai_dir, index_path, force, workers, fold_near, log, collect):
+    started = time.perf_counter()
+    manifest = load_manifest(index_path)
+    fold_near = fold_threshold(manifest, fold_near)
+    if force or (manifest and (
+            manifest.get("schema_version") != FORMAT_VERSION
+            or manifest.get("fold_near", 0.0) != fold_near)):
+        manifest = None
+    old_files = manifest["files"] if manifest else {}
+    current = {
+        f.relative_to(ai_dir).as_posix(): f for f in collect_files(ai_dir)
+    }
+    new, maybe_changed, removed, unchanged = plan_changes(old_files, current)
+    counts = {"added": 0, "updated": 0, "deleted": len(removed),
+              "skipped": len(unchanged), "errors": 0}
+    if manifest and not (new or maybe_changed or removed):
+        log(f"Index up to date: {len(unchanged)} files unchanged")
+        return counts
+
+    files, docs = {}, []
+    deduper = Deduper({}, fold_near)
+    jobs = [(rel, str(path), None) for rel, path in current.items()]
+    for prepared in iter_prepared(jobs, workers, collect):
+        rel_path = prepared["rel_path"]
+        if "error" in prepared:
+            counts["errors"] += 1
+            log(f"  WARN: {rel_path}: {prepared['error']}")
+            continue
+        entry = prepared["entry"]
+        files[rel_path] = entry
+        if fold_near:
+            entry["sketch"] = prepared["sketch"]
+        canonical = deduper.canonical_for(rel_path, entry)
+        if canonical is not None:
+            entry["alias_of"] = canonical
+        else:
+            docs.append(prepared["fields"])
+            docs.extend(prepared["sections"])
+        if rel_path in unchanged:
+            continue
+        old_entry = old_files.get(rel_path)
+        if old_entry is None:
+            counts["added"] += 1
+        elif old_entry.get("hash") == entry["hash"]:
+            counts["skipped"] += 1
+        else:
+            counts["updated"] += 1
+
+    if manifest and not (counts["added"] or counts["updated"] or removed):
+        # Only mtimes moved (fresh clone, imported snapshot): keep the arrays
+        manifest["files"] = files
+        save_manifest(index_path, manifest)
+        log(f"Index up to date: {len(files)} files unchanged")
+        return counts
+
+    target = new_generation(index_path)
+    try:
+        num_terms = _write_arrays(target, docs, alias_groups(files))
+        save_manifest(target, {
+            "schema_version": FORMAT_VERSION,
+            "last_commit": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "fold_near": fold_near,
+            "files": files,
+        })
+    except BaseException:
+        discard(target)
+        raise
+    publish(index_path, target)
+    log(f"Index built (numpy): {counts['added']} added, "
+        f"{counts['updated']} updated, {counts['deleted']} deleted, "
+        f"{counts['skipped']} skipped, {counts['errors']} errors "
+        f"— {len(docs)} docs, {num_terms} terms in "
+        f"{time.perf_counter() - started:.2f}s")
+    dedup_note = summary(files)
+    if dedup_note:
+        log(dedup_note)
+    log(f"Location: {index_path}")
+    return counts
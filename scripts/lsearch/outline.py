@@ -0,0 +1,123 @@
+"""outline.py — compact, query-independent outline of each indexed file.
+
+Computed once per file at index time (pipeline.prepare_file) so "what's
+in this note?" is answered from the index instead of re-reading it:
+
+    lines      line count
+    headings   [[level, heading, line], ...] — the heading tree
+    summary    first paragraph, markup stripped
+    rules      rule numbers mentioned ("规则 30", "Rule 35")
+    principles principle ids (ARCH-01, PRACTICE-04)
+    links      outbound link targets, first occurrence order
+
+For .py/.yaml files the headings are the symbol / key sections and the
+summary is the module docstring's first paragraph.
+
+Each outline is stored as JSON of at most OUTLINE_BUDGET bytes, so
+reading one costs the same whatever the note's size. Over budget, links
+are dropped from the end first, then the deepest headings (last first),
+then principle ids and rule numbers; the summary is shortened last.
+"dropped" counts the items cut.
+"""
+
+import json
+import re
+
+from md_scan import scan_markdown
+
+OUTLINE_BUDGET = 1536      # bytes of JSON per file
+SUMMARY_CHARS = 280
+
+_RULE = re.compile(r"(?:规则|\b[Rr]ule)\s*#?(\d+)")
+_PRINCIPLE = re.compile(r"\b[A-Z]{3,9}-\d{2}\b")
+_FRONTMATTER = re.compile(r"\A---\n.*?\n---\n", re.DOTALL)
+_NOT_PROSE = re.compile(r"#|-{3,}\s*$|\||```|~~~|<!--")
+
+
+def _summary(content):
+    """First prose paragraph: not a heading, rule, table, fence or comment."""
+    content = _FRONTMATTER.sub("", content)
+    for block in re.split(r"\n\s*\n", content):
+        block = block.strip()
+        if block and not _NOT_PROSE.match(block):
+            # Keep inline code text (the scanner drops it from bodies)
+            return scan_markdown(block.replace("`", "")).body[:SUMMARY_CHARS]
+    return ""
+
+
+def _rules(content):
+    return sorted({int(n) for n in _RULE.findall(content)})
+
+
+def _links(targets):
+    return list(dict.fromkeys(t for t in targets if not t.startswith("#")))
+
+
+def markdown_outline(content, scanned):
+    """Outline dict of a markdown file (scanned = scan_markdown(content))."""
+    return {
+        "lines": scanned.line_count,
+        "headings": [list(h) for h in scanned.headings],
+        "summary": _summary(content),
+        "rules": _rules(content),
+        "principles": sorted(set(_PRINCIPLE.findall(content))),
+        "links": _links(target for _, target in scanned.links),
+    }
+
+
+def code_outline(content, fields, sections):
+    """Outline dict of a .py/.yaml file from its codeindex sections."""
+    return {
+        "lines": len(content.splitlines()),
+        "headings": [[s["chain"].count(" > ") + 1, s["title"], s["line_start"]]
+                     for s in sections],
+        "summary": " ".join(fields["description"].split())[:SUMMARY_CHARS],
+        "rules": [],
+        "principles": [],
+        "links": [],
+    }
+
+
+def encode_outline(outline, budget=OUTLINE_BUDGET):
+    """JSON text of outline, trimmed to at most budget bytes."""
+    outline = dict(outline, dropped=0)
+    while True:
+        text = json.dumps(outline, ensure_ascii=False, separators=(",", ":"))
+        if len(text.encode("utf-8")) <= budget:
+            return text
+        if outline["links"]:
+            outline["links"] = outline["links"][:-1]
+        elif outline["headings"]:
+            deepest = max(h[0] for h in outline["headings"])
+            drop = max(i for i, h in enumerate(outline["headings"])
+                       if h[0] == deepest)
+            outline["headings"] = (outline["headings"][:drop]
+                                   + outline["headings"][drop + 1:])
+        elif outline["principles"] or outline["rules"]:
+            key = "principles" if outline["principles"] else "rules"
+            outline[key] = outline[key][:-1]
+        elif outline["summary"]:
+            outline["summary"] = outline["summary"][:-16]
+            continue
+        else:
+            return text
+        outline["dropped"] += 1
+
+
+def format_outline(outline, indent="     "):
+    """Printable lines for an outline dict."""
+    lines = [f"{indent}{outline['lines']} lines"
+             + (f", {outline['dropped']} items cut" if outline["dropped"]
+                else "")]
+    if outline["summary"]:
+        lines.append(f"{indent}{outline['summary']}")
+    for level, heading, line in outline["headings"]:
+        lines.append(f"{indent}{'  ' * (level - 1)}- {heading}  (L{line})")
+    if outline["rules"]:
+        lines.append(f"{indent}rules: "
+                     + ", ".join(map(str, outline["rules"])))
+    if outline["principles"]:
+        lines.append(f"{indent}principles: " + ", ".join(outline["principles"]))
+    if outline["links"]:
+        lines.append(f"{indent}links: " + ", ".join(outline["links"]))
+    return lines
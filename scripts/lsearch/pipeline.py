@@ -0,0 +1,148 @@
+"""pipeline.py — parallel preprocessing stage for build_index.
+
+Reading, hashing and scanning (markdown, or .py/.yaml via codeindex.py)
+are pure Python and CPU-bound, so they run in a process pool. Workers
+return plain dicts (tantivy objects don't pickle); the single writer in
+the parent turns them into documents in the original file order.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from md_scan import scan_markdown, split_sections
+
+from lsearch.codeindex import code_terms, scan_python, scan_yaml
+from lsearch.corpus import SECTION_MAX_LEVEL, parse_frontmatter
+from lsearch.dedup import norm_hash, normalize, sketch
+from lsearch.filters import dir_facet
+from lsearch.outline import code_outline, encode_outline, markdown_outline
+from lsearch.manifest import fingerprint
+
+# Below this many files a pool costs more to start than it saves
+MIN_PARALLEL_FILES = 64
+CHUNK_SIZE = 16
+
+
+def default_workers():
+    """One worker per CPU, leaving one for the writer."""
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def prepare_file(job):
+    """Read and preprocess one file (runs in a worker process).
+
+    job is (rel_path, absolute path str, old content hash or None).
+    Returns a dict with the new manifest entry plus either
+    "fields" (document fields), "unchanged": True, or "error". The entry
+    of a changed file includes "norm" and the result a "sketch" of its
+    text (dedup.py).
+    """
+    rel_path, fpath, old_hash = job
+    try:
+        with open(fpath, "rb") as f:
+            data = f.read()
+        stat = os.stat(fpath)
+        entry = fingerprint(stat, data)
+        if old_hash == entry["hash"]:
+            # Touched but identical (checkout, copy): just refresh mtime
+            return {"rel_path": rel_path, "entry": entry, "unchanged": True}
+        content = data.decode("utf-8")
+        normalized = normalize(content)
+        entry["norm"] = norm_hash(normalized)
+        # Aware UTC datetime: indexed date fields reject strings
+        modified = datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+        fields, sections = _scan(rel_path, content)
+        common = {
+            "path": [rel_path],
+            "dir": [dir_facet(rel_path)],  # facet path; see make_document
+            "modified": modified,
+        }
+        return {
+            "rel_path": rel_path,
+            "entry": entry,
+            "sketch": sketch(normalized),
+            "fields": dict(_wrap(fields), kind=["file"], size=stat.st_size,
+                           **common),
+            "sections": [dict(_wrap(sec), kind=["section"], **common)
+                         for sec in sections],
+        }
+    except Exception as e:
+        return {"rel_path": rel_path, "error": str(e)}
+
+
+def _fenced_terms(scanned):
+    """code field text for a scanned markdown doc: fenced + inline code."""
+    return code_terms(" ".join(
+        [code for _, code, _ in scanned.code] + scanned.inline_code))
+
+
+def _scan(rel_path, content):
+    """(file fields, [section fields]) as plain values, by file type.
+
+    The file fields include "outline" (outline.py), which is stored with
+    the bodies rather than in the engine's documents.
+    """
+    name = rel_path.rsplit("/", 1)[-1]
+    suffix = name[name.rfind("."):].lower()
+    scan = {".py": scan_python, ".yaml": scan_yaml, ".yml": scan_yaml}.get(
+        suffix)
+    if scan is not None:
+        fields, sections = scan(content, name)
+        fields["outline"] = encode_outline(
+            code_outline(content, fields, sections))
+        return fields, sections
+    scanned = scan_markdown(content)
+    sections = []
+    for sec in split_sections(content, scanned, SECTION_MAX_LEVEL):
+        sec_scanned = scan_markdown(sec.text)
+        sections.append({
+            "title": sec.heading or scanned.title,
+            "body": sec_scanned.body,
+            "code": _fenced_terms(sec_scanned),
+            "size": len(sec.text.encode("utf-8")),
+            "anchor": sec.anchor,
+            "chain": " > ".join(sec.chain),
+            "line_start": sec.line_start,
+            "line_end": sec.line_end,
+        })
+    fields = {
+        "title": scanned.title,
+        "body": scanned.body,
+        "code": _fenced_terms(scanned),
+        "description": parse_frontmatter(content).get("description", ""),
+        "outline": encode_outline(markdown_outline(content, scanned)),
+    }
+    return fields, sections
+
+
+def _wrap(fields):
+    """Text values as one-element lists, as tantivy.Document expects."""
+    return {k: [v] if isinstance(v, str) else v for k, v in fields.items()}
+
+
+def iter_prepared(jobs, workers=None, collect=None):
+    """Yield prepare_file results in job order, in parallel when worth it.
+
+    collect, a dict, also gets {rel_path: {"rel_path", "entry", "fields"}}
+    for every file read in full, so related.py can reuse the index
+    build's work instead of reading the corpus again.
+    """
+    for prepared in _prepare_all(jobs, workers):
+        if collect is not None and "fields" in prepared:
+            # Own entry copy: the index build adds keys to the original
+            collect[prepared["rel_path"]] = {
+                "rel_path": prepared["rel_path"],
+                "entry": dict(prepared["entry"]),
+                "fields": prepared["fields"]}
+        yield prepared
+
+
+def _prepare_all(jobs, workers):
+    workers = workers or default_workers()
+    if workers <= 1 or len(jobs) < MIN_PARALLEL_FILES:
+        for job in jobs:
+            yield prepare_file(job)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(prepare_file, jobs, chunksize=CHUNK_SIZE)
@@ -0,0 +1,81 @@
+"""planner.py — the text part of a query: exact, then phrase, then fuzzy.
+
+run_query tries up to three stages in one call and keeps the first that
+finds anything, so a typo costs a fallback instead of another round trip:
+
+    exact   the query language as typed, over all fields, field-boosted
+    phrase  the query's words as a literal phrase (slop PHRASE_SLOP); only
+            when the query language rejects the input ("a(b", "foo:bar",
+            an unbalanced quote), which used to be an error
+    fuzzy   each word within an edit distance that grows with its length
+            (FUZZY_DISTANCES), any word may match
+
+Every hit is tagged with the stage that produced it ("stage").
+"""
+
+import re
+
+from lsearch.engine import tantivy
+
+# Default per-field boosts (--boost FIELD=WEIGHT overrides); the *_cjk
+# fields follow the field they mirror
+FIELD_BOOSTS = {"title": 3.0, "description": 1.5, "code": 1.2, "body": 1.0}
+CJK_MIRRORS = {"title_cjk": "title", "body_cjk": "body"}
+
+PHRASE_SLOP = 2
+# (minimum word length, edit distance): words of 4+ chars may be one
+# edit off, 8+ chars two; shorter words must match exactly
+FUZZY_DISTANCES = ((8, 2), (4, 1))
+FUZZY_FIELDS = ("title", "body", "description")
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def field_boosts(fields, overrides=None):
+    """Boost per searched field: FIELD_BOOSTS with overrides applied."""
+    boosts = dict(FIELD_BOOSTS)
+    for field, weight in (overrides or {}).items():
+        if field not in FIELD_BOOSTS:
+            raise ValueError(f"unknown boost field {field!r}; use one of "
+                             + ", ".join(FIELD_BOOSTS))
+        boosts[field] = float(weight)
+    return {f: boosts[CJK_MIRRORS.get(f, f)] for f in fields}
+
+
+def _distance(word):
+    for length, distance in FUZZY_DISTANCES:
+        if len(word) >= length:
+            return distance
+    return 0
+
+
+def _fuzzy_query(index, words, fields, boosts):
+    """One Should clause per word, fuzzy on the non-CJK fields."""
+    clauses = []
+    for word in words:
+        distance = _distance(word)
+        fuzzy = {f: (False, distance, True)
+                 for f in FUZZY_FIELDS if f in fields} if distance else {}
+        clauses.append((tantivy.Occur.Should, index.parse_query(
+            word, fields, field_boosts=boosts, fuzzy_fields=fuzzy)))
+    return tantivy.Query.boolean_query(clauses)
+
+
+def plan(index, query_str, fields, boosts):
+    """Yield (stage, text query) in the order run_query should try them.
+
+    Raises ValueError when the query language rejects the input and it
+    has no words to fall back on.
+    """
+    words = _WORD.findall(query_str)
+    try:
+        exact = index.parse_query(query_str, fields, field_boosts=boosts)
+    except ValueError as e:
+        if not words:
+            raise ValueError(f"bad query: {e}") from None
+        yield "phrase", index.parse_query(
+            f'"{" ".join(words)}"~{PHRASE_SLOP}', fields, field_boosts=boosts)
+    else:
+        yield "exact", exact
+    if any(_distance(w) for w in words):
+        yield "fuzzy", _fuzzy_query(index, words, fields, boosts)
@@ -0,0 +1,131 @@
+"""publish.py — build-aside index generations, atomic swap, writer lock.
+
+Standard library only. The index path (.search_index) is a symlink to a
+generation directory next to it:
+
+    .search_index -> .search_index.gen-3
+    .search_index.gen-2      previous generation, kept for open readers
+    .search_index.lock       held by whichever build is running
+
+A full rebuild (or snapshot import) fills a new generation directory
+and then replaces the symlink with os.replace on a temporary link: one
+rename, so a reader opens either the old index or the new one, never a
+missing or half-built directory. The generation before is kept for
+readers that still have it open; older ones are removed on publish.
+Incremental builds write into the current generation through the
+engine's own commit (tantivy replaces meta.json atomically).
+
+writer_lock() lets one build run at a time; readers never take it.
+Where symlinks are unavailable (Windows without developer mode) the
+swap falls back to two renames, leaving a short gap with no index.
+"""
+
+import contextlib
+import os
+import re
+import shutil
+import sys
+
+from lsearch.manifest import MANIFEST_NAME
+
+LOCK_SUFFIX = ".lock"
+GEN_SUFFIX = ".gen-"
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextlib.contextmanager
+def writer_lock(index_path):
+    """Exclusive, blocking lock for building the index at index_path."""
+    path = index_path.with_name(index_path.name + LOCK_SUFFIX)
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                print("Waiting for another build to finish...",
+                      file=sys.stderr)
+                fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _generations(index_path):
+    """{number: path} of the generation directories next to index_path."""
+    pattern = re.compile(re.escape(index_path.name + GEN_SUFFIX) + r"(\d+)$")
+    found = {}
+    for entry in index_path.parent.iterdir():
+        match = pattern.match(entry.name)
+        if match and entry.is_dir() and not entry.is_symlink():
+            found[int(match.group(1))] = entry
+    return found
+
+
+def new_generation(index_path):
+    """Create and return an empty directory for the next generation."""
+    number = max(_generations(index_path), default=0) + 1
+    path = index_path.with_name(f"{index_path.name}{GEN_SUFFIX}{number}")
+    path.mkdir()
+    return path
+
+
+def publish(index_path, generation):
+    """Point index_path at generation; prune all but it and the previous."""
+    previous = None
+    if index_path.is_symlink():
+        previous = index_path.parent / os.readlink(index_path)
+    elif index_path.is_dir():
+        # Real directory (older layout or rename fallback): keep it as
+        # generation 0 so it can be pruned like any other
+        previous = index_path.with_name(f"{index_path.name}{GEN_SUFFIX}0")
+        if previous.exists():
+            shutil.rmtree(previous)
+        index_path.rename(previous)
+
+    link = index_path.with_name(index_path.name + ".swap")
+    if link.is_symlink() or link.exists():
+        link.unlink()
+    try:
+        os.symlink(generation.name, link, target_is_directory=True)
+    except (OSError, NotImplementedError):
+        generation.rename(index_path)
+        generation = index_path
+    else:
+        os.replace(link, index_path)
+
+    keep = {generation.resolve(), previous.resolve() if previous else None}
+    for path in _generations(index_path).values():
+        if path.resolve() not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def index_generation(index_path):
+    """Cheap token that changes whenever a build commits.
+
+    Every build rewrites the manifest after its commit, and a full
+    rebuild swaps in a new generation directory, so (dir inode, manifest
+    mtime) covers both. Used by both backends.
+    """
+    try:
+        return (index_path.stat().st_ino,
+                (index_path / MANIFEST_NAME).stat().st_mtime_ns)
+    except FileNotFoundError:
+        return None
+
+
+def discard(generation):
+    """Remove a generation that failed to build."""
+    shutil.rmtree(generation, ignore_errors=True)
@@ -0,0 +1,226 @@
+"""query.py — run one query against an open index and shape the hits.
+
+The index holds two kinds of documents per markdown file (see
+pipeline.prepare_file): one "file" document and one "section" document
+per heading section. Queries pick a kind; sections carry an anchor,
+the heading chain and a line range so a hit points straight at the
+relevant part of the note.
+
+Filters (dirs, since, until) are extra Must clauses on the dir facet and
+the modified fast field, so they narrow the candidate set before top-k
+instead of trimming it afterwards; recent adds boosted Should clauses
+on modified (see filters.RECENCY_TIERS). The text part of the query
+comes from planner.plan: exact, then phrase, then fuzzy.
+"""
+
+import datetime
+
+from lsearch.corpus import collapse_snippet, has_cjk
+from lsearch.dedup import attach_aliases, matching_copies, relocate
+from lsearch.engine import tantivy
+from lsearch.filters import normalize_dir, parse_when, recency_windows
+from lsearch.planner import field_boosts, plan
+
+# Range bounds for open-ended --since/--until (tantivy dates are i64
+# nanoseconds, so the upper bound has to stay before 2262)
+_DATE_MIN = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+_DATE_MAX = datetime.datetime(2200, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _first(doc, field, default):
+    try:
+        return doc[field][0]
+    except (KeyError, IndexError):
+        return default
+
+
+def _collapsed_hits(searcher, query, top_k):
+    """Best hit per file, widening the search until top_k files are found."""
+    limit = top_k * 4
+    while True:
+        result = searcher.search(query, limit)
+        best = {}
+        for score, address in result.hits:
+            path = _first(searcher.doc(address), "path", "?")
+            if path not in best:
+                best[path] = (score, address)
+            if len(best) == top_k:
+                return list(best.values())
+        if len(result.hits) < limit:
+            return list(best.values())
+        limit *= 4
+
+
+def _char_ranges(fragment, ranges):
+    """tantivy highlight ranges are UTF-8 byte offsets; convert to chars.
+
+    Adjacent ranges are merged (CJK matches come one character each).
+    """
+    data = fragment.encode("utf-8")
+    merged = []
+    for r in ranges:
+        start = len(data[:r.start].decode("utf-8", "ignore"))
+        end = len(data[:r.end].decode("utf-8", "ignore"))
+        if merged and merged[-1][1] == start:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _snippet(generator, body, budget, field):
+    """Best-matching body fragment (<= budget chars) plus highlight spans."""
+    # Bodies aren't stored in tantivy: hand the generator the text from
+    # the body store under the field the query matched on
+    snippet = generator.snippet_from_doc(tantivy.Document(**{field: [body]}))
+    fragment = snippet.fragment()
+    if not fragment:
+        # Matched on title only: show the start of the body instead
+        return collapse_snippet(body[:budget], [])
+    return collapse_snippet(fragment,
+                            _char_ranges(fragment, snippet.highlighted()))
+
+
+def _modified_range(schema, start, end):
+    return tantivy.Query.range_query(
+        schema, "modified", tantivy.FieldType.Date, start, end)
+
+
+def _filter_clauses(schema, dirs, since, until, recent, copies=()):
+    """Boolean clauses for the dir/date filters and the recency boost.
+
+    copies: canonical paths let through the filters because a folded
+    copy of theirs passes them (dedup.matching_copies).
+    """
+    filters = []
+    if dirs:
+        facets = [
+            tantivy.Query.term_query(
+                schema, "dir", tantivy.Facet.from_string("/" + normalize_dir(d)))
+            for d in dirs
+        ]
+        filters.append(tantivy.Query.boolean_query(
+            [(tantivy.Occur.Should, q) for q in facets]))
+    if since or until:
+        start = parse_when(since) if since else _DATE_MIN
+        end = parse_when(until, end=True) if until else _DATE_MAX
+        filters.append(_modified_range(schema, start, end))
+    if filters and copies:
+        own = tantivy.Query.boolean_query(
+            [(tantivy.Occur.Must, q) for q in filters])
+        filters = [tantivy.Query.boolean_query([
+            (tantivy.Occur.Should, own),
+            (tantivy.Occur.Should, tantivy.Query.term_set_query(
+                schema, "path", sorted(copies))),
+        ])]
+    clauses = [(tantivy.Occur.Must, q) for q in filters]
+    for start, boost in recency_windows(recent):
+        clauses.append((tantivy.Occur.Should, tantivy.Query.boost_query(
+            _modified_range(schema, start, _DATE_MAX), boost)))
+    return clauses
+
+
+def run_query(index, query_str, top_k=5, sections=False, collapse=False,
+              snippet_chars=0, dirs=None, since=None, until=None, recent=0.0,
+              boosts=None, outline=False):
+    """Run one query; returns result dicts, best first.
+
+    sections=True searches heading sections instead of whole files;
+    collapse=True then keeps only the best section of each file.
+    snippet_chars > 0 adds "snippet" (at most that many chars of the
+    stored body around the best match) and "highlights" ([start, end]
+    char offsets of matched terms inside the snippet).
+    dirs limits hits to those directories (and below); since/until to
+    a modification window ("2026-02-01", "7d"); recent > 0 adds up to
+    1.75 × recent to the score of recently modified notes.
+    boosts overrides planner.FIELD_BOOSTS ({"title": 5}). outline=True
+    adds each hit's file outline (outline.py) from the body store. Each
+    result has "stage": the planner stage that found it, and hits on a
+    file with folded copies (dedup.py) their paths as "aliases"; the
+    filters pass a file when any copy does, and the hit then names it.
+    """
+    searcher = index.searcher()
+    schema = index.schema
+
+    # Search title (boosted), body, code and description; CJK text goes
+    # to the parallel *_cjk fields, where it is split per character
+    cjk = has_cjk(query_str)
+    fields = ["title", "body", "code", "description"] + (
+        ["title_cjk", "body_cjk"] if cjk else [])
+    snippet_field = "body_cjk" if cjk else "body"
+    kind = tantivy.Query.term_query(
+        schema, "kind", "section" if sections else "file")
+    copies = {}
+    if dirs or since or until:
+        copies = matching_copies(index.body_store().groups(), dirs, since,
+                                 until)
+    clauses = [(tantivy.Occur.Must, kind)] + _filter_clauses(
+        schema, dirs, since, until, recent, copies)
+
+    # First planner stage with any hit wins
+    for stage, text_query in plan(index, query_str, fields,
+                                  field_boosts(fields, boosts)):
+        query = tantivy.Query.boolean_query(
+            [(tantivy.Occur.Must, text_query)] + clauses)
+        if sections and collapse:
+            hits = _collapsed_hits(searcher, query, top_k)
+        else:
+            hits = searcher.search(query, top_k).hits
+        if hits:
+            break
+
+    generator = None
+    if snippet_chars > 0:
+        generator = tantivy.SnippetGenerator.create(
+            searcher, text_query, schema, snippet_field)
+        generator.set_max_num_chars(snippet_chars)
+
+    # Numeric fields come from fast-field columns in one batch per field;
+    # the doc store is only read for the short text fields
+    addresses = [address for _, address in hits]
+    sizes = searcher.fast_field_values("size", addresses)
+    if sections:
+        line_starts = searcher.fast_field_values("line_start", addresses)
+        line_ends = searcher.fast_field_values("line_end", addresses)
+    bodies = {}
+    if generator is not None:
+        body_ids = searcher.fast_field_values("body_id", addresses)
+        bodies = index.body_store().get_many(body_ids)
+
+    results = []
+    for i, (score, doc_address) in enumerate(hits):
+        doc = searcher.doc(doc_address)
+        result = {
+            "score": score,
+            "title": _first(doc, "title", "(no title)"),
+            "path": _first(doc, "path", "?"),
+            "size": sizes[i] or 0,
+            "stage": stage,
+        }
+        description = _first(doc, "description", "")
+        if description:
+            result["description"] = description
+        if sections:
+            result["anchor"] = _first(doc, "anchor", "")
+            result["heading"] = _first(doc, "chain", "")
+            result["lines"] = [line_starts[i] or 1, line_ends[i] or 1]
+        if generator is not None:
+            result["snippet"], result["highlights"] = _snippet(
+                generator, bodies.get(body_ids[i], ""), snippet_chars,
+                snippet_field)
+        results.append(result)
+    if outline:
+        outlines = index.body_store().outlines(r["path"] for r in results)
+        for result in results:
+            result["outline"] = outlines.get(result["path"])
+    results = attach_aliases(results, index.body_store().aliases(
+        r["path"] for r in results))
+    return relocate(results, copies)
+
+
+def file_outline(index, rel_path):
+    """Outline dict of one indexed file (or of the file a copy is folded
+    into), or None."""
+    store = index.body_store()
+    canonical = store.canonical(rel_path)
+    return store.outlines([canonical]).get(canonical)
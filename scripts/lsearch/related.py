@@ -0,0 +1,341 @@
+"""related.py — precomputed "related notes" table for --related path.md.
+
+Each file is a sparse TF-IDF vector (title counted TITLE_WEIGHT times,
+sublinear tf, L2-normalized, same tokens as the numpy backend). Cosine
+similarities come from a sparse × sparse product done with plain NumPy:
+a block of CHUNK_ROWS rows is expanded over the term → docs postings and
+summed with bincount, so memory is bounded by CHUNK_ROWS × docs. The
+top TOP_N neighbours per file are kept in .search_index_related/:
+
+    manifest.json   file fingerprints + row table (row -> path, title)
+    vocab.json      terms; idf.npy the idf frozen at the last full build
+    x_indptr/x_indices/x_data.npy   the vectors (CSR, one row per file)
+    neighbors.npy, scores.npy       TOP_N row ids / cosines (-1 = none)
+
+Incremental builds re-read only new and changed files. Their rows and
+the rows that listed a changed or deleted file are recomputed against
+everything; every other row just merges in its similarity to the
+changed files, which gives the same table as a full build for the frozen
+idf. New terms and df shifts wait for the next full build, which runs
+once changes since the last one exceed REBUILD_FRACTION of the corpus.
+Either way the arrays are written to a new generation directory and
+swapped in under the writer lock (publish.py), so --related never reads
+a half-written table.
+
+Copies of a note (same normalized text, dedup.py) are left out of its
+neighbours, and only the first copy of another note is listed.
+"""
+
+import json
+import sys
+import time
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:
+    print("ERROR: numpy not installed. Run: pip install numpy")
+    sys.exit(1)
+
+from lsearch.corpus import RELATED_DIR_NAME, collect_files
+from lsearch.manifest import load_manifest, plan_changes, save_manifest
+from lsearch.npbm25 import TITLE_WEIGHT, tokenize
+from lsearch.pipeline import iter_prepared
+from lsearch.publish import discard, new_generation, publish, writer_lock
+
+TABLE_VERSION = 2
+TOP_N = 10
+CHUNK_ROWS = 256
+REBUILD_FRACTION = 0.2
+
+_ARRAYS = ("idf", "x_indptr", "x_indices", "x_data", "neighbors", "scores")
+
+
+def _term_counts(fields):
+    counts = Counter(tokenize(fields["body"][0]))
+    counts.update(tokenize(fields.get("description", [""])[0]))
+    for token in tokenize(fields["title"][0]):
+        counts[token] += TITLE_WEIGHT
+    return counts
+
+
+def _vector(counts, term_id, idf):
+    """Sorted term ids and L2-normalized sublinear tf-idf weights."""
+    pairs = sorted((term_id[t], c) for t, c in counts.items() if t in term_id)
+    ids = np.array([i for i, _ in pairs], dtype=np.int32)
+    tf = np.array([c for _, c in pairs], dtype=np.float64)
+    weights = (1 + np.log(tf)) * idf[ids]
+    norm = np.linalg.norm(weights)
+    return ids, (weights / norm if norm else weights).astype(np.float32)
+
+
+def _csr(rows):
+    lengths = [len(ids) for ids, _ in rows]
+    indptr = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+    indices = np.concatenate([ids for ids, _ in rows] or [[]]).astype(np.int32)
+    data = np.concatenate([w for _, w in rows] or [[]]).astype(np.float32)
+    return indptr, indices, data
+
+
+def _similarities(x, vocab_size, row_ids):
+    """Yield (row ids, dense cosine block) for CHUNK_ROWS rows at a time."""
+    indptr, indices, data = x
+    n = len(indptr) - 1
+    # Column view: for each term, the docs containing it
+    order = np.argsort(indices, kind="stable")
+    col_docs = np.repeat(np.arange(n), np.diff(indptr))[order]
+    col_vals = data[order]
+    col_ptr = np.concatenate(
+        [[0], np.cumsum(np.bincount(indices, minlength=vocab_size))])
+    for start in range(0, len(row_ids), CHUNK_ROWS):
+        chunk = np.asarray(row_ids[start:start + CHUNK_ROWS], dtype=np.int64)
+        lengths = indptr[chunk + 1] - indptr[chunk]
+        local = np.repeat(np.arange(len(chunk)), lengths)
+        entry = np.repeat(indptr[chunk] - np.cumsum(np.r_[0, lengths[:-1]]),
+                          lengths) + np.arange(lengths.sum())
+        terms, weights = indices[entry], data[entry]
+        # Expand every (row, term) entry over that term's postings
+        df = col_ptr[terms + 1] - col_ptr[terms]
+        pos = np.repeat(col_ptr[terms] - np.cumsum(np.r_[0, df[:-1]]),
+                        df) + np.arange(df.sum())
+        products = np.repeat(weights, df) * col_vals[pos]
+        cells = np.repeat(local, df) * n + col_docs[pos]
+        block = np.bincount(cells, weights=products,
+                            minlength=len(chunk) * n).reshape(len(chunk), n)
+        block[np.arange(len(chunk)), chunk] = 0  # not its own neighbour
+        yield chunk, block
+
+
+def _top_n(candidates, scores):
+    """Best TOP_N (id, score) per row; -1 / 0 where fewer are > 0."""
+    k = min(TOP_N, scores.shape[1])
+    best = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+    top_scores = np.take_along_axis(scores, best, axis=1)
+    top_ids = np.take_along_axis(candidates, best, axis=1)
+    top_ids[top_scores <= 0] = -1
+    top_scores[top_scores <= 0] = 0
+    pad = TOP_N - k
+    return (np.pad(top_ids, ((0, 0), (0, pad)), constant_values=-1),
+            np.pad(top_scores, ((0, 0), (0, pad))))
+
+
+def _table_rows(x, vocab_size, row_ids, neighbors, scores, keep=None):
+    """Recompute neighbours of row_ids in place; return their full blocks
+    for the rows in `keep` (used to patch the other rows afterwards)."""
+    n = len(x[0]) - 1
+    kept = {}
+    for chunk, block in _similarities(x, vocab_size, row_ids):
+        ids = np.broadcast_to(np.arange(n), block.shape)
+        neighbors[chunk], scores[chunk] = _top_n(ids, block)
+        for i, row in enumerate(chunk):
+            if keep is not None and row in keep:
+                kept[int(row)] = block[i]
+    return kept
+
+
+def build_related(ai_dir, force=False, workers=None, prepared=None):
+    """Create or incrementally update the neighbour table.
+
+    prepared is what the index build collected (iter_prepared): files
+    found there are not read again.
+    """
+    path = ai_dir / RELATED_DIR_NAME
+    with writer_lock(path):
+        return _build(ai_dir, path, force, workers, prepared or {})
+
+
+def _prepare(jobs, workers, prepared):
+    """iter_prepared, answered from `prepared` where possible."""
+    todo = []
+    for job in jobs:
+        done = prepared.get(job[0])
+        if done is None:
+            todo.append(job)
+        elif done["entry"]["hash"] == job[2]:
+            yield {"rel_path": job[0], "entry": done["entry"],
+                   "unchanged": True}
+        else:
+            yield done
+    yield from iter_prepared(todo, workers)
+
+
+def _build(ai_dir, path, force, workers, prepared):
+    started = time.perf_counter()
+    manifest = None if force else load_manifest(path)
+    if manifest and manifest.get("schema_version") != TABLE_VERSION:
+        manifest = None
+    old_files = manifest["files"] if manifest else {}
+    current = {
+        f.relative_to(ai_dir).as_posix(): f for f in collect_files(ai_dir)
+    }
+    new, maybe_changed, removed, unchanged = plan_changes(old_files, current)
+    if manifest and not (new or maybe_changed or removed):
+        return None
+
+    files = dict(old_files)
+    changed = {}  # rel path -> prepared fields
+    jobs = [(rel, str(current[rel]), old_files.get(rel, {}).get("hash"))
+            for rel in new + maybe_changed]
+    for result in _prepare(jobs, workers, prepared):
+        if "error" in result:
+            continue
+        # Touched-but-identical entries keep the old "norm"
+        files[result["rel_path"]] = dict(
+            old_files.get(result["rel_path"], {}), **result["entry"])
+        if not result.get("unchanged"):
+            changed[result["rel_path"]] = result["fields"]
+    for rel in removed:
+        del files[rel]
+
+    # Changes applied against the frozen idf since the last full build
+    drift = len(changed) + len(removed) + (manifest or {}).get("drift", 0)
+    full = manifest is None or (
+        drift > REBUILD_FRACTION * max(manifest.get("full_rows", 0), 1))
+    if full:
+        if manifest is not None:
+            # idf drifted too far: re-read everything
+            jobs = [(rel, str(current[rel]), None) for rel in current]
+            changed = {p["rel_path"]: p["fields"]
+                       for p in _prepare(jobs, workers, prepared)
+                       if "fields" in p}
+    if not (full or changed or removed):
+        # Only mtimes moved: keep the arrays (the manifest write is atomic)
+        save_manifest(path, dict(manifest, files=files, drift=drift))
+        return {"full": False, "changed": 0, "removed": 0,
+                "seconds": time.perf_counter() - started}
+    target = new_generation(path)
+    try:
+        if full:
+            rows = _full_build(target, changed)
+        else:
+            rows = _update(path, target, manifest, changed, removed)
+        save_manifest(target, {
+            "schema_version": TABLE_VERSION,
+            "files": files,
+            "rows": rows["rows"],
+            "titles": rows["titles"],
+            "full_rows": rows["full_rows"],
+            "drift": 0 if full else drift,
+        })
+    except BaseException:
+        discard(target)
+        raise
+    publish(path, target)
+    elapsed = time.perf_counter() - started
+    return {"full": full, "changed": len(changed), "removed": len(removed),
+            "seconds": elapsed}
+
+
+def _save(path, vocab, arrays):
+    with open(path / "vocab.json", "w", encoding="utf-8") as f:
+        json.dump(vocab, f, ensure_ascii=False)
+    for name, array in arrays.items():
+        np.save(path / f"{name}.npy", array)
+
+
+def _full_build(path, docs):
+    paths = sorted(docs)
+    counts = [_term_counts(docs[rel]) for rel in paths]
+    vocab = sorted(set().union(*counts)) if counts else []
+    term_id = {t: i for i, t in enumerate(vocab)}
+    df = np.zeros(len(vocab))
+    for c in counts:
+        df[[term_id[t] for t in c]] += 1
+    idf = np.log((1 + len(paths)) / (1 + df)) + 1
+    x = _csr([_vector(c, term_id, idf) for c in counts])
+    neighbors = np.full((len(paths), TOP_N), -1, dtype=np.int32)
+    scores = np.zeros((len(paths), TOP_N), dtype=np.float32)
+    _table_rows(x, len(vocab), np.arange(len(paths)), neighbors, scores)
+    _save(path, vocab, dict(zip(_ARRAYS, (idf, *x, neighbors, scores))))
+    return {"rows": paths, "titles": [docs[p]["title"][0] for p in paths],
+            "full_rows": len(paths)}
+
+
+def _update(path, target, manifest, changed, removed):
+    """Patch the table in path for the changes, writing it to target."""
+    with open(path / "vocab.json", "r", encoding="utf-8") as f:
+        vocab = json.load(f)
+    term_id = {t: i for i, t in enumerate(vocab)}
+    arrays = {name: np.load(path / f"{name}.npy") for name in _ARRAYS}
+    idf = arrays["idf"]
+    rows, titles = list(manifest["rows"]), list(manifest["titles"])
+    indptr = arrays["x_indptr"]
+    vectors = [(arrays["x_indices"][indptr[i]:indptr[i + 1]],
+                arrays["x_data"][indptr[i]:indptr[i + 1]])
+               for i in range(len(rows))]
+    row_of = {rel: i for i, rel in enumerate(rows) if rel is not None}
+
+    touched = set()
+    for rel in removed:  # rows stay (ids are stable); the vector empties
+        i = row_of.pop(rel)
+        rows[i], titles[i] = None, ""
+        vectors[i] = (np.zeros(0, np.int32), np.zeros(0, np.float32))
+        touched.add(i)
+    changed_rows = []
+    for rel, fields in changed.items():
+        if rel not in row_of:
+            row_of[rel] = len(rows)
+            rows.append(rel)
+            titles.append("")
+            vectors.append(None)
+        i = row_of[rel]
+        titles[i] = fields["title"][0]
+        vectors[i] = _vector(_term_counts(fields), term_id, idf)
+        changed_rows.append(i)
+    touched.update(changed_rows)
+
+    n = len(rows)
+    x = _csr(vectors)
+    neighbors = np.full((n, TOP_N), -1, dtype=np.int32)
+    scores = np.zeros((n, TOP_N), dtype=np.float32)
+    old = len(arrays["neighbors"])
+    neighbors[:old], scores[:old] = arrays["neighbors"], arrays["scores"]
+
+    # Rows that pointed at a changed/removed file lose a neighbour whose
+    # score moved: recompute them in full along with the changed rows
+    stale = np.isin(neighbors, list(touched)).any(axis=1)
+    recompute = sorted(set(changed_rows) | set(np.flatnonzero(stale)))
+    recompute = [i for i in recompute if rows[i] is not None]
+    recomputed = set(recompute)
+    neighbors[list(touched)] = -1
+    scores[list(touched)] = 0
+    blocks = _table_rows(x, len(vocab), recompute, neighbors, scores,
+                         keep=set(changed_rows))
+
+    # Everyone else: merge in the similarity to each changed file
+    others = np.array([i for i in range(n) if rows[i] is not None
+                       and i not in recomputed], dtype=np.int64)
+    if len(others) and changed_rows:
+        extra = np.stack([blocks[i][others] for i in changed_rows], axis=1)
+        candidates = np.hstack([
+            neighbors[others],
+            np.broadcast_to(np.array(changed_rows), extra.shape)])
+        merged = np.hstack([scores[others], extra])
+        neighbors[others], scores[others] = _top_n(candidates, merged)
+
+    _save(target, vocab, dict(zip(_ARRAYS, (idf, *x, neighbors, scores))))
+    return {"rows": rows, "titles": titles,
+            "full_rows": manifest.get("full_rows", n)}
+
+
+def related_notes(ai_dir, rel_path, top_k=TOP_N):
+    """[(score, path, title)] for rel_path from the table; None if unknown."""
+    # Resolved first so the manifest and arrays come from one generation
+    path = (ai_dir / RELATED_DIR_NAME).resolve()
+    manifest = load_manifest(path)
+    if manifest is None or rel_path not in manifest.get("rows", []):
+        return None
+    row = manifest["rows"].index(rel_path)
+    neighbors = np.load(path / "neighbors.npy", mmap_mode="r")[row]
+    scores = np.load(path / "scores.npy", mmap_mode="r")[row]
+    files = manifest["files"]
+    seen = {files[rel_path].get("norm")}
+    notes = []
+    for i, score in zip(neighbors, scores):
+        other = manifest["rows"][i] if i >= 0 else None
+        norm = files.get(other, {}).get("norm") if other else None
+        if other is None or (norm is not None and norm in seen):
+            continue
+        seen.add(norm)
+        notes.append((float(score), other, manifest["titles"][i]))
+    return notes[:top_k]
@@ -0,0 +1,139 @@
+"""server.py — keep the index open and answer queries over a Unix socket.
+
+Started with `local_search.py --serve [--backend ...]`. The index is
+loaded once; before each request the server checks the index generation
+and only reloads (or reopens, after a full rebuild) when a commit landed.
+"""
+
+import json
+import os
+import socketserver
+import sys
+import threading
+
+from lsearch import backends
+from lsearch.client import send_request, socket_path
+from lsearch.suggest import suggest
+
+
+class WarmIndex:
+    """An open index plus the generation it reflects."""
+
+    def __init__(self, backend, index_path):
+        self.backend = backend
+        self.index_path = index_path
+        self.index = None
+        self.generation = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the index, reloaded if a build committed since last use."""
+        generation = self.backend.index_generation(self.index_path)
+        if generation is None:
+            raise RuntimeError("No index found. Run --build first.")
+        with self._lock:
+            if self.index is None or generation[0] != self.generation[0]:
+                # Full rebuild replaced the directory: reopen from scratch
+                self.index = self.backend.open_index(self.index_path)
+            elif generation != self.generation:
+                self.index.reload()
+            self.generation = generation
+            return self.index
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """One JSON request per line, one JSON reply per line."""
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                response = self.server.dispatch(json.loads(line))
+            except Exception as e:
+                response = {"ok": False, "error": str(e)}
+            payload = json.dumps(response, ensure_ascii=False) + "\n"
+            self.wfile.write(payload.encode("utf-8"))
+            self.wfile.flush()
+            if self.server.stopping:
+                # Reply first, then stop: shutdown() blocks until
+                # serve_forever returns, so it needs its own thread.
+                threading.Thread(target=self.server.shutdown,
+                                 daemon=True).start()
+                return
+
+
+class SearchServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, warm):
+        self.warm = warm
+        self.stopping = False
+        super().__init__(str(path), _Handler)
+
+    def dispatch(self, request):
+        op = request.get("op")
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid(),
+                    "backend": self.warm.backend.name}
+        wanted = request.get("backend", "auto")
+        if op in ("search", "suggest", "outline") and wanted not in (
+                "auto", self.warm.backend.name):
+            return {"ok": False, "error": "server runs the "
+                    f"{self.warm.backend.name} backend, not {wanted}"}
+        if op == "search":
+            index = self.warm.get()
+            results = self.warm.backend.run_query(index, request["query"],
+                                                  int(request.get("top_k", 5)),
+                                                  **request.get("options", {}))
+            return {"ok": True, "results": results}
+        if op == "suggest":
+            results = suggest(self.warm.backend, self.warm.get(),
+                              request["prefix"], int(request.get("limit", 10)))
+            return {"ok": True, "results": results}
+        if op == "outline":
+            outline = self.warm.backend.file_outline(self.warm.get(),
+                                                     request["path"])
+            return {"ok": True, "outline": outline}
+        if op == "shutdown":
+            self.stopping = True
+            return {"ok": True}
+        return {"ok": False, "error": f"unknown op: {op!r}"}
+
+
+def serve(ai_dir, backend="auto"):
+    """Run the search server in the foreground until Ctrl-C or --stop."""
+    sys.stdout.reconfigure(encoding="utf-8")
+    if not hasattr(socketserver, "UnixStreamServer"):
+        print("ERROR: --serve needs Unix domain sockets (not available here)")
+        sys.exit(1)
+
+    path = socket_path(ai_dir)
+    if path.exists():
+        if send_request(ai_dir, {"op": "ping"}) is not None:
+            print(f"Server already running on {path}")
+            return
+        path.unlink()  # stale socket from a crashed server
+
+    backend = backends.load(backend)
+    index_path = ai_dir / backend.index_dir_name
+    if not index_path.exists():
+        print("No index found. Building...")
+        backend.build_index(ai_dir)
+
+    warm = WarmIndex(backend, index_path)
+    warm.get()
+    old_umask = os.umask(0o077)  # socket readable by this user only
+    try:
+        server = SearchServer(path, warm)
+    finally:
+        os.umask(old_umask)
+
+    print(f"Serving {ai_dir} ({backend.name}) on {path} (Ctrl-C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if path.exists():
+            path.unlink()
+    print("Server stopped")
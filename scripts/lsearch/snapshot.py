@@ -0,0 +1,140 @@
+"""snapshot.py — export/import the search index as one checksummed archive.
+
+Standard library only. A snapshot is a gzipped tar holding
+
+    snapshot.json   snapshot_version, backend, schema_version, created,
+                    last_commit, and the sha256 of every index file
+    index/<name>    the index directory's files: segments and meta.json
+                    (or the numpy arrays), body store, manifest.json
+
+Lock files, the query cache and leftover *.tmp files stay out. Import
+checks the version, backend and schema against the running code, writes
+the files into a new index generation while verifying their checksums,
+and only then swaps it in (publish.py); both sides hold the writer
+lock. The manifest travels with the segments, so the next build only
+re-indexes files whose content differs from the snapshot (after a fresh
+clone every mtime differs, but the content hash decides).
+"""
+
+import datetime
+import hashlib
+import io
+import json
+import tarfile
+
+from lsearch.cache import CACHE_NAME
+from lsearch.manifest import load_manifest
+from lsearch.publish import discard, new_generation, publish, writer_lock
+
+SNAPSHOT_VERSION = 1
+HEADER_NAME = "snapshot.json"
+_CHUNK = 1 << 20
+
+
+def snapshot_name(index_dir_name):
+    """Default archive name next to the index: ".search_index" ->
+    "search_index.snapshot.tar.gz" (not hidden, so git_sync picks it up)."""
+    return index_dir_name.lstrip(".") + ".snapshot.tar.gz"
+
+
+def _is_index_file(entry):
+    name = entry.name
+    return (entry.is_file() and not name.startswith(CACHE_NAME)
+            and not name.startswith(".tantivy-") and not name.endswith(".tmp"))
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def export_snapshot(index_path, out_path, backend, schema_version):
+    """Write index_path to out_path (atomically); returns the header."""
+    with writer_lock(index_path):
+        manifest = load_manifest(index_path)
+        if manifest is None:
+            raise ValueError(f"{index_path} has no manifest; run --build first")
+        return _export(index_path, out_path, backend, schema_version,
+                       manifest)
+
+
+def _export(index_path, out_path, backend, schema_version, manifest):
+    names = sorted(e.name for e in index_path.iterdir() if _is_index_file(e))
+    header = {
+        "snapshot_version": SNAPSHOT_VERSION,
+        "backend": backend,
+        "schema_version": schema_version,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "last_commit": manifest.get("last_commit"),
+        "num_files": len(manifest["files"]),
+        "files": {name: _sha256(index_path / name) for name in names},
+    }
+    data = json.dumps(header, ensure_ascii=False, indent=1).encode("utf-8")
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    with tarfile.open(tmp, "w:gz") as tar:
+        info = tarfile.TarInfo(HEADER_NAME)
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+        for name in names:
+            tar.add(index_path / name, arcname=f"index/{name}")
+    tmp.replace(out_path)
+    return header
+
+
+def read_header(tar):
+    """The snapshot.json of an open archive; raises ValueError."""
+    try:
+        header = json.load(tar.extractfile(HEADER_NAME))
+    except (KeyError, ValueError):
+        raise ValueError("not a search index snapshot") from None
+    if header.get("snapshot_version") != SNAPSHOT_VERSION:
+        raise ValueError(f"snapshot version {header.get('snapshot_version')}"
+                         f" is not supported (expected {SNAPSHOT_VERSION})")
+    return header
+
+
+def import_snapshot(snapshot_path, index_path, backend, schema_version):
+    """Replace index_path with the snapshot's index; returns the header.
+
+    Raises ValueError (leaving the current index alone) if the snapshot
+    was made by another backend or schema version, or fails its checksums.
+    """
+    with writer_lock(index_path), tarfile.open(snapshot_path, "r:gz") as tar:
+        header = read_header(tar)
+        for key, expected in (("backend", backend),
+                              ("schema_version", schema_version)):
+            if header.get(key) != expected:
+                raise ValueError(f"snapshot {key} is {header.get(key)!r}, "
+                                 f"this code needs {expected!r}")
+        target = new_generation(index_path)
+        try:
+            for name, expected in header["files"].items():
+                if "/" in name or "\\" in name or name in ("", ".", ".."):
+                    raise ValueError(f"bad file name in snapshot: {name!r}")
+                _extract(tar, f"index/{name}", target / name, expected)
+        except BaseException:
+            discard(target)
+            raise
+        publish(index_path, target)
+    return header
+
+
+def _extract(tar, member, dest, expected):
+    """Copy one archive member to dest, checking its sha256."""
+    try:
+        source = tar.extractfile(member)
+    except KeyError:
+        raise ValueError(f"{member} is missing from the snapshot") from None
+    if source is None:
+        raise ValueError(f"{member} is not a regular file")
+    digest = hashlib.sha256()
+    with open(dest, "wb") as f:
+        while chunk := source.read(_CHUNK):
+            digest.update(chunk)
+            f.write(chunk)
+    if digest.hexdigest() != expected:
+        raise ValueError(f"checksum mismatch for {member}; "
+                         "the snapshot is corrupt")
@@ -0,0 +1,94 @@
+"""stats.py — index statistics and compaction.
+
+Counts come from the searcher and tantivy's meta.json, per-directory
+numbers and the last commit time from the manifest; nothing walks the
+corpus or queries for "*".
+"""
+
+import json
+import os
+from collections import Counter
+
+from lsearch.bodystore import BODY_STORE_NAME
+from lsearch.cache import CACHE_NAME
+from lsearch.dedup import manifest_counts
+from lsearch.engine import build_index, open_index, tantivy
+from lsearch.manifest import load_manifest
+from lsearch.publish import writer_lock
+
+
+def segment_info(index_path):
+    """Segment count, live/deleted doc totals and opstamp from meta.json."""
+    with open(index_path / "meta.json", "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    segments = meta.get("segments", [])
+    max_doc = sum(seg["max_doc"] for seg in segments)
+    deleted = sum((seg.get("deletes") or {}).get("num_deleted_docs", 0)
+                  for seg in segments)
+    return {
+        "segments": len(segments),
+        "max_doc": max_doc,
+        "deleted": deleted,
+        "deleted_ratio": deleted / max_doc if max_doc else 0.0,
+        "opstamp": meta.get("opstamp"),
+    }
+
+
+def index_stats(index_path):
+    """Collect index statistics as a dict."""
+    index = open_index(index_path)
+    searcher = index.searcher()
+    files_query = tantivy.Query.term_query(index.schema, "kind", "file")
+    file_docs = searcher.search(files_query, 1).count
+
+    manifest = load_manifest(index_path) or {"files": {}}
+    by_dir = Counter(
+        rel.split("/", 1)[0] if "/" in rel else "." for rel in manifest["files"]
+    )
+    # tantivy keeps a flat directory, so one scandir is enough
+    sizes = {entry.name: entry.stat().st_size
+             for entry in os.scandir(index_path) if entry.is_file()}
+    cache_size = sum(size for name, size in sizes.items()
+                     if name.startswith(CACHE_NAME))
+    return {
+        "num_docs": searcher.num_docs,
+        "file_docs": file_docs,
+        "section_docs": searcher.num_docs - file_docs,
+        **manifest_counts(manifest["files"]),
+        "by_dir": dict(sorted(by_dir.items())),
+        "last_commit": manifest.get("last_commit"),
+        "index_size": sum(sizes.values()) - cache_size,
+        "body_store_size": sizes.get(BODY_STORE_NAME, 0),
+        **segment_info(index_path),
+    }
+
+
+def compact_index(ai_dir, index_path):
+    """Merge segments and drop unused files; rebuild if still fragmented.
+
+    tantivy-py has no explicit merge call: an empty commit plus
+    wait_merging_threads() lets the merge policy run to completion, then
+    garbage_collect_files() removes files no segment references. The
+    policy leaves a handful of segments alone, so if more than one
+    segment or any deleted docs remain, the index is rewritten instead.
+    The merge holds the build lock (publish.writer_lock), so it waits for
+    a running build instead of failing on tantivy's own lock; the lock is
+    released before the rebuild, which takes it again.
+    """
+    with writer_lock(index_path):
+        before = segment_info(index_path)
+        index = open_index(index_path)
+        writer = index.writer()
+        writer.commit()
+        writer.wait_merging_threads()
+        writer = index.writer()
+        writer.garbage_collect_files()
+        del writer  # releases tantivy's writer lock
+        after = segment_info(index_path)
+
+    if after["segments"] > 1 or after["deleted"]:
+        print(f"Still {after['segments']} segments, "
+              f"{after['deleted_ratio']:.0%} deleted — rebuilding")
+        build_index(ai_dir, force=True)
+        after = segment_info(index_path)
+    return before, after
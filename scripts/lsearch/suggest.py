@@ -0,0 +1,62 @@
+"""suggest.py — prefix completions from the index's term dictionary.
+
+`--suggest "sess"` lists words that actually occur in the notes, most
+common first, so a query can be built from terms that will match:
+
+    session       41 notes
+    sessions      12 notes
+
+Only the last word is completed; earlier words are kept as typed
+("session en" -> "session end"). Counts are notes (file documents)
+containing the word; sections are not counted twice.
+
+Both backends answer from a sorted term list built with the index, so
+suggestions follow every incremental build:
+
+    tantivy  the "words" field: title, body and code of each file
+             document, unstemmed and lowercased (snake_case kept
+             whole), indexed without frequencies or positions. Its
+             term dictionary (an FST) is the prefix index;
+             Searcher.terms_with_prefix walks it.
+    numpy    the sorted "terms" array (binary search for the prefix
+             range) and a per-term count of file documents, "file_df".
+"""
+
+import re
+
+WORDS_FIELD = "words"
+DEFAULT_LIMIT = 10
+
+_LAST_WORD = re.compile(r"(\S*)$")
+
+
+def split_prefix(text):
+    """("session ", "en") for "session en": kept text, word to complete."""
+    text = text.lstrip()
+    last = _LAST_WORD.search(text).group(1)
+    return text[:len(text) - len(last)], last.lower()
+
+
+def tantivy_prefix_terms(index, prefix, limit):
+    """[(term, notes), ...] from the tantivy "words" term dictionary."""
+    return index.searcher().terms_with_prefix(WORDS_FIELD, prefix,
+                                              limit=limit)
+
+
+def array_prefix_terms(index, prefix, limit):
+    """[(term, notes), ...] from the numpy backend's sorted term array."""
+    terms = index.terms
+    start = int(terms.searchsorted(prefix))
+    end = int(terms.searchsorted(prefix + "\U0010ffff"))
+    counts = index.file_df[start:end]
+    # Most notes first, then alphabetical (argsort is stable)
+    order = (-counts).argsort(kind="stable")
+    return [(str(terms[start + i]), int(counts[i]))
+            for i in order[:limit] if counts[i] > 0]
+
+
+def suggest(backend, index, text, limit=DEFAULT_LIMIT):
+    """[(completed text, notes), ...] for the last word of text."""
+    head, prefix = split_prefix(text)
+    return [(head + term, count)
+            for term, count in backend.prefix_terms(index, prefix, limit)]
@@ -0,0 +1,249 @@
+"""watch.py — keep the index current while notes are edited (--watch).
+
+Change detection uses Linux inotify through ctypes when libc has it,
+and otherwise polls mtimes (a stat walk, no reads) every POLL_INTERVAL
+seconds. Either way the watcher only produces root-relative paths; they
+are collected until the tree has been quiet for DEBOUNCE seconds (or
+MAX_BATCH_WAIT has passed since the first change) and then handed to
+build_index(paths=...) as one batch, so a save burst is one commit.
+A directory moved or deleted away queues every indexed path under it,
+and an inotify queue overflow (events lost) makes the batch a full
+incremental build instead.
+
+Directories in SKIP_PATTERNS and the index directories themselves are
+never watched; files are filtered with corpus.is_indexed_path.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+from lsearch.corpus import (
+    INDEX_DIR_NAME, INDEX_DIRS, SKIP_PATTERNS, is_indexed_path,
+)
+from lsearch.manifest import load_manifest
+
+DEBOUNCE = 0.5
+MAX_BATCH_WAIT = 5.0
+POLL_INTERVAL = 1.0
+
+# inotify(7) constants
+_IN_MODIFY = 0x002
+_IN_ATTRIB = 0x004
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_DELETE_SELF = 0x400
+_IN_Q_OVERFLOW = 0x4000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_WATCH_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM
+               | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF)
+_EVENT = struct.Struct("iIII")
+
+
+def _skip_dir(name):
+    return name in SKIP_PATTERNS or name.startswith(INDEX_DIR_NAME)
+
+
+def _watched_dirs_under(path):
+    for root, dirs, _ in os.walk(path):
+        dirs[:] = [d for d in dirs if not _skip_dir(d)]
+        yield root
+
+
+def _watched_dirs(ai_dir):
+    """Every directory collect_files would descend into."""
+    seen = set()
+    for subdir in INDEX_DIRS:
+        target = ai_dir / subdir
+        if not target.is_dir():
+            continue
+        for root in _watched_dirs_under(target):
+            path = os.path.realpath(root)
+            if path not in seen:
+                seen.add(path)
+                yield root
+
+
+def _rel(ai_dir, path):
+    return os.path.relpath(path, ai_dir).replace(os.sep, "/")
+
+
+class InotifyWatcher:
+    """Recursive inotify watch; poll() yields changed rel paths.
+
+    poll() returns None when the kernel queue overflowed. known_paths()
+    lists the indexed rel paths, for directories that go away.
+    """
+
+    def __init__(self, ai_dir, known_paths):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify not available")
+        self.libc = libc
+        self.ai_dir = ai_dir
+        self.known_paths = known_paths
+        self.fd = libc.inotify_init1(_IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}  # watch descriptor -> directory path
+        for root in _watched_dirs(ai_dir):
+            self._add(root)
+
+    def _add(self, root):
+        wd = self.libc.inotify_add_watch(
+            self.fd, os.fsencode(root), _WATCH_MASK)
+        if wd >= 0:
+            self.dirs[wd] = root
+
+    def _drop(self, root):
+        """Stop watching root and everything under it."""
+        for wd, path in list(self.dirs.items()):
+            if path == root or path.startswith(root + os.sep):
+                # Fails harmlessly when the kernel already removed it
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.dirs[wd]
+
+    def poll(self, timeout):
+        changed = set()
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return changed
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & _IN_Q_OVERFLOW:
+                return None
+            root = self.dirs.get(wd)
+            if root is None or not name:
+                continue
+            path = os.path.join(root, name)
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO) and not _skip_dir(name):
+                    # New directory: watch it, and pick up files that
+                    # landed before the watch existed
+                    for sub in _watched_dirs_under(path):
+                        self._add(sub)
+                        changed.update(_rel(self.ai_dir, os.path.join(sub, f))
+                                       for f in os.listdir(sub))
+                elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                    # Gone as a whole (mv out): no events for its files
+                    prefix = _rel(self.ai_dir, path) + "/"
+                    changed.update(rel for rel in self.known_paths()
+                                   if rel.startswith(prefix))
+                    self._drop(path)
+                continue
+            changed.add(_rel(self.ai_dir, path))
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollWatcher:
+    """mtime/size snapshot diff of the watched directories."""
+
+    def __init__(self, ai_dir):
+        self.ai_dir = ai_dir
+        self.snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for root in _watched_dirs(self.ai_dir):
+            with os.scandir(root) as entries:
+                for entry in entries:
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                    snapshot[_rel(self.ai_dir, entry.path)] = (
+                        stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def poll(self, timeout):
+        time.sleep(min(timeout, POLL_INTERVAL))
+        snapshot = self._scan()
+        changed = {rel for rel, sig in snapshot.items()
+                   if self.snapshot.get(rel) != sig}
+        changed.update(rel for rel in self.snapshot if rel not in snapshot)
+        self.snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+def make_watcher(ai_dir, known_paths):
+    """InotifyWatcher where the platform has it, else PollWatcher."""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(ai_dir, known_paths)
+        except (OSError, AttributeError, TypeError):
+            pass
+    return PollWatcher(ai_dir)
+
+
+def watch(ai_dir, backend, **build_options):
+    """Apply edits to the index in debounced batches until Ctrl-C.
+
+    backend is a backends.load() namespace.
+    """
+    sys.stdout.reconfigure(encoding="utf-8")
+    build_index = backend.build_index
+    build_index(ai_dir, **build_options)  # catch up on offline edits
+    index_path = ai_dir / backend.index_dir_name
+
+    def known_paths():
+        return (load_manifest(index_path) or {}).get("files", {})
+
+    watcher = make_watcher(ai_dir, known_paths)
+    print(f"Watching {ai_dir} ({type(watcher).__name__}, "
+          f"debounce {DEBOUNCE}s; Ctrl-C to stop)")
+    pending, first_change, last_change = set(), None, None
+    rescan = False
+    try:
+        while True:
+            timeout = DEBOUNCE if pending or rescan else POLL_INTERVAL
+            changed = watcher.poll(timeout)
+            now = time.monotonic()
+            lost = changed is None  # queue overflow: events were dropped
+            changed = set() if lost else {
+                rel for rel in changed if is_indexed_path(rel)}
+            if changed or lost:
+                rescan = rescan or lost
+                pending |= changed
+                first_change = first_change or now
+                last_change = now
+            if not (pending or rescan):
+                continue
+            if (now - last_change < DEBOUNCE
+                    and now - first_change < MAX_BATCH_WAIT):
+                continue
+            batch = None if rescan else sorted(pending)
+            commit_start = time.monotonic()
+            build_index(ai_dir, paths=batch, **build_options)
+            done = time.monotonic()
+            what = "full scan" if rescan else f"{len(batch)} file(s)"
+            print(f"[{time.strftime('%H:%M:%S')}] {what}: "
+                  f"commit {done - commit_start:.2f}s, "
+                  f"latency {done - first_change:.2f}s since first change seen")
+            pending, first_change, last_change = set(), None, None
+            rescan = False
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    print("Watch stopped")
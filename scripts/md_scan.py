@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+md_scan.py — markdown scanner, shared by scripts that walk notes.
+
+One compiled regex tokenizes the document (a single re.sub with a
+routing callback); text that isn't markup is copied into the body as-is,
+and each markup hit is routed to its own output. The body then takes
+one more re.sub to drop leftover emphasis/quote/table markers and a
+whitespace collapse; split_sections walks the lines separately, only
+when sections are wanted. Replaces the old strip_markdown/extract_title
+chain (six re.sub passes + a title search, each copying the whole string).
+
+Usage (library):
+    from md_scan import scan_markdown
+    doc = scan_markdown(text)
+    doc.title, doc.headings, doc.body, doc.links, doc.code
+    for sec in split_sections(text, doc):   # per-heading chunks + anchors
+        sec.chain, sec.anchor, sec.line_start, sec.line_end
+
+Usage (CLI, for a quick look):
+    python md_scan.py path/to/note.md
+
+Prerequisites:
+    Python 3.8+, no external dependencies.
+"""
+
+import re
+import sys
+from dataclasses import dataclass, field
+
+# One alternation, one pass. The leading lookahead lets the regex engine
+# skip in C to the next character that can start markup at all, instead
+# of trying every alternative at every position. Fences before inline code.
+_TOKEN = re.compile(
+    r"(?=[`~#\[-])(?:"
+    r"(?P<fence>^(?P<fmark>`{3,}|~{3,})(?P<lang>[^\n]*)\n"
+    r"(?P<code>[\s\S]*?)(?:^(?P=fmark)[ \t]*$|\Z))"
+    r"|(?P<heading>^(?P<hashes>\#{1,6})[ \t]+(?=(?P<htext>[^\n]*)))"
+    r"|(?P<icode>`[^`\n]+`)"
+    r"|(?P<link>\[(?P<ltext>[^\]\n]+)\]\((?P<ltarget>[^)\n]+)\))"
+    r"|(?P<rule>-{3,}))",
+    re.MULTILINE,
+)
+_FALLBACK_TITLE = re.compile(r"^[ \t]*(?!---)(\S[^\n]*)", re.MULTILINE)
+_SLUG_DROP = re.compile(r"[^\w\- ]")
+# Emphasis/quote/table markers become spaces (same set strip_markdown
+# used). A regex beats str.translate here: on non-ASCII (CJK) text
+# translate falls back to a slow per-char path.
+_MARKERS = re.compile(r"[#*_~>|]+")
+
+
+@dataclass
+class ScannedDoc:
+    """Everything scan_markdown yields for one document.
+
+    headings: (level, raw text, 1-based line)
+    links:    (link text, target)
+    code:     (info string, code text, 1-based line of the opening fence)
+    """
+    title: str = "(no title)"
+    headings: list = field(default_factory=list)
+    body: str = ""
+    links: list = field(default_factory=list)
+    code: list = field(default_factory=list)
+    inline_code: list = field(default_factory=list)
+    line_count: int = 0
+
+
+@dataclass
+class Section:
+    """One heading section: its heading line up to the next split heading.
+
+    level is 0 (and heading/anchor empty) for text before the first heading.
+    chain lists the enclosing headings, outermost first, ending with this one.
+    """
+    level: int
+    heading: str
+    chain: list
+    anchor: str
+    line_start: int
+    line_end: int
+    text: str
+
+
+def scan_markdown(text):
+    """Scan a markdown document once and split it into its parts."""
+    doc = ScannedDoc()
+    links, inline_code = doc.links, doc.inline_code
+    cursor = [1, 0]  # [line number, offset it was counted up to]
+
+    def route(m):
+        # Called once per markup hit; returns what the body keeps.
+        kind = m.lastgroup
+        if kind == "link":
+            ltext = m.group("ltext")
+            links.append((ltext, m.group("ltarget")))
+            return ltext
+        if kind == "icode":
+            inline_code.append(m.group()[1:-1])
+            return " "
+        if kind == "rule":  # rule / table separator
+            return " "
+        start = m.start()
+        cursor[0] += text.count("\n", cursor[1], start)
+        cursor[1] = start
+        if kind == "heading":
+            doc.headings.append(
+                (len(m.group("hashes")), m.group("htext").strip(), cursor[0]))
+        else:
+            doc.code.append((m.group("lang").strip(), m.group("code"), cursor[0]))
+        return " "  # heading text itself is scanned next
+
+    stripped = _TOKEN.sub(route, text)
+    doc.body = " ".join(_MARKERS.sub(" ", stripped).split())
+    doc.line_count = text.count("\n") + (1 if text and text[-1] != "\n" else 0)
+
+    for level, htext, _ in doc.headings:
+        if level == 1:
+            doc.title = htext
+            break
+    else:
+        match = _FALLBACK_TITLE.search(text)
+        if match:
+            doc.title = match.group(1).strip()[:100]
+    return doc
+
+
+def slugify(heading, seen=None):
+    """GitHub-style anchor slug; pass a shared `seen` dict to number repeats."""
+    slug = _SLUG_DROP.sub("", heading.strip().lower()).replace(" ", "-")
+    if seen is not None:
+        count = seen.get(slug, 0)
+        seen[slug] = count + 1
+        if count:
+            slug = f"{slug}-{count}"
+    return slug
+
+
+def split_sections(text, doc=None, max_level=3):
+    """Cut a document at every heading of level <= max_level.
+
+    Deeper headings stay inside their parent's section. Anchors are
+    numbered over all headings, as GitHub does, so #foo-1 links resolve.
+    """
+    doc = doc or scan_markdown(text)
+    lines = text.split("\n")
+    seen = {}
+    anchors = {line: slugify(htext, seen) for _, htext, line in doc.headings}
+    cuts = [h for h in doc.headings if h[0] <= max_level]
+
+    sections = []
+    first = cuts[0][2] if cuts else doc.line_count + 1
+    preamble = "\n".join(lines[:first - 1])
+    if preamble.strip():
+        sections.append(Section(0, "", [], "", 1, first - 1, preamble))
+
+    stack = []
+    for i, (level, htext, line) in enumerate(cuts):
+        end = cuts[i + 1][2] - 1 if i + 1 < len(cuts) else doc.line_count
+        while stack and stack[-1][0] >= level:
+            stack.pop()
+        stack.append((level, htext))
+        sections.append(Section(
+            level, htext, [h for _, h in stack], anchors[line],
+            line, end, "\n".join(lines[line - 1:end]),
+        ))
+    return sections
+
+
+def main():
+    sys.stdout.reconfigure(encoding="utf-8")
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        text = f.read()
+    doc = scan_markdown(text)
+    print(f"Title:    {doc.title}")
+    print(f"Lines:    {doc.line_count}")
+    print(f"Headings: {len(doc.headings)}")
+    anchors = {sec.line_start: sec.anchor for sec in split_sections(text, doc, 6)}
+    for level, htext, line in doc.headings:
+        print(f"  L{line:<5}{'  ' * (level - 1)}{htext}  #{anchors[line]}")
+    print(f"Links:    {len(doc.links)}")
+    print(f"Code:     {len(doc.code)} fenced, {len(doc.inline_code)} inline")
+    print(f"Body:     {len(doc.body)} chars")
+
+
+if __name__ == "__main__":
+    main()